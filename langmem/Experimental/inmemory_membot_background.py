@@ -1,18 +1,23 @@
 """
 MemBot: A context-aware chatbot using LangGraph and LangMem with InMemorySaver.
 - Uses Azure ChatGPT for responses.
-- Stores every query and response in InMemoryStore with all-MiniLM-L12-v2 embeddings.
+- Stores every query and response in the background as a structured record (thread_id, role, date) in IndexedInMemoryStore with all-MiniLM-L12-v2 embeddings, timestamps and recency-aware ranking.
 - Persists messages state in-memory via thread_id and InMemorySaver.
+- Prefetches the top-k relevant memories concurrently with prompt preparation on every turn.
+- Keeps a compact user profile up to date in the background and passes it to the agent on every turn.
+- IndexedInMemoryStore runs aput/asearch (embedding + search) on its own thread pool, keeping the event loop responsive.
 """
 
 import os
 import asyncio
 from langgraph.prebuilt import create_react_agent
 from langgraph.checkpoint.memory import MemorySaver
-from langgraph.store.memory import InMemoryStore
 from langmem import create_manage_memory_tool, create_search_memory_tool
 from sentence_transformers import SentenceTransformer
 from azure_openai_llm import get_llm  # Assuming this provides an async-compatible LLM
+from memory_prefetch import start_aprefetch, acollect_prefetch, with_memories
+from indexed_store import IndexedInMemoryStore, answer_chronological_query, aput_memory, print_memories
+from profile_memory import ProfileUpdater, get_profile, with_profile
 
 # Embedding model setup
 embedding_model = SentenceTransformer('all-MiniLM-L12-v2')
@@ -23,11 +28,15 @@ def embed_text(text: str) -> list:
 
 # Memory store and checkpointer setup
 NAMESPACE = ("user_1",)
-memory_store = InMemoryStore(index={"dims": 384, "embed": embed_text})
+memory_store = IndexedInMemoryStore(index={"dims": 384, "embed": embed_text, "fields": ["content"]})
 checkpointer = MemorySaver()  # In-memory persistence for messages state
 
-# Azure ChatGPT model (assumed to support async)
+# Azure ChatGPT models: replies run at foreground priority, profile updates at background priority
 llm = get_llm()
+background_llm = get_llm(priority="background")
+
+# Background profile maintenance
+profile_updater = ProfileUpdater(background_llm, memory_store, NAMESPACE)
 
 # Memory tools (assumed to be sync; we'll wrap them if needed)
 manage_memory_tool = create_manage_memory_tool(namespace=NAMESPACE)
@@ -37,8 +46,9 @@ search_memory_tool = create_search_memory_tool(namespace=NAMESPACE)
 SYSTEM_PROMPT = """
 You are MemBot, a helpful assistant with memory. Your goals:
 1. Assist users conversationally.
-2. Use `manage_memory_tool` to store EVERY user query and assistant response as a single memory entry.
-3. For questions about past interactions, ALWAYS use `search_memory_tool` to retrieve relevant memories. Sort memories by order (earliest first) and return the EXACT user input from the first relevant memory. If the tool fails, use the conversation history (messages) to find the first user input.
+2. Every user query and assistant response is stored automatically as a memory with thread, role and date metadata. Use `manage_memory_tool` only to update or delete memories when asked.
+3. Relevant memories are prefetched and passed to you as a system message. Answer from them when they suffice; otherwise, for questions about past interactions, use `search_memory_tool` to retrieve more. Each memory carries `created_at` and `seq` fields if you need its order. If the tool fails, rely on the conversation history (messages).
+4. A profile of known facts about the user may be passed as a system message; use it for personal questions ("what do you know about me") instead of searching.
 Keep responses natural and use the full conversation history (passed in messages) for coherence.
 """
 
@@ -52,30 +62,14 @@ agent = create_react_agent(
 )
 
 async def print_stored_memories() -> None:
-    """Print all memories stored in InMemoryStore, extracting content."""
-    print("\n--- Stored Memories ---")
-    try:
-        all_memories = memory_store._data.get(NAMESPACE, {})
-        if not all_memories:
-            print("No memories stored yet.")
-        else:
-            for i, (key, item) in enumerate(sorted(all_memories.items(), key=lambda x: x[0]), 1):
-                value = getattr(item, "value", "None") if item else "None"
-                if isinstance(value, dict) and "content" in value:
-                    value = value["content"]
-                print(f"Memory {i}: Key={key}, Value={value}")
-    except Exception as e:
-        print(f"Error retrieving memories: {e}")
-    print("----------------------\n")
+    """Print the newest page of stored memories."""
+    print_memories(memory_store, NAMESPACE)
 
-async def store_memory_in_background(agent, memory_entry: str, config: dict, delay: float = 4.0) -> None:
-    """Store a memory entry asynchronously in the background."""
+async def store_memory_in_background(memory_entry: str, config: dict, delay: float = 4.0) -> None:
+    """Store a memory entry as a structured record asynchronously in the background."""
     await asyncio.sleep(delay)
     try:
-        await agent.ainvoke(
-            {"messages": [{"role": "system", "content": f"Use manage_memory_tool to store: {memory_entry}"}]},
-            config=config
-        )
+        await aput_memory(memory_store, NAMESPACE, memory_entry, thread_id=config["configurable"]["thread_id"])
     except Exception as e:
         print(f"Error storing memory in background: {e}")
 
@@ -94,14 +88,29 @@ async def chat_with_membot() -> None:
                 print("MemBot: Goodbye!")
                 break
 
+            # Answer "first/last message" questions from the chronological index
+            chrono_answer = answer_chronological_query(memory_store, NAMESPACE, user_input)
+            if chrono_answer:
+                print(f"MemBot: {chrono_answer}")
+                conversation_history.append({"role": "user", "content": user_input})
+                conversation_history.append({"role": "assistant", "content": chrono_answer})
+                continue
+
+            # Prefetch relevant memories while the prompt is prepared
+            prefetch = start_aprefetch(memory_store, NAMESPACE, user_input)
+
             # Normalize input
             normalized_input = user_input.lower()
 
             # Add user input to history
             conversation_history.append({"role": "user", "content": user_input})
 
-            # Invoke agent asynchronously
-            response = await agent.ainvoke({"messages": conversation_history}, config=config)
+            # Invoke agent asynchronously with prefetched memories
+            memories = await acollect_prefetch(prefetch)
+            memory_store.record_access(memories)
+            messages = with_memories(conversation_history, memories)
+            messages = with_profile(messages, get_profile(memory_store, NAMESPACE))
+            response = await agent.ainvoke({"messages": messages}, config=config)
 
             # Extract response
             ai_response = (
@@ -116,7 +125,8 @@ async def chat_with_membot() -> None:
 
             # Store memory in the background using a task
             memory_entry = f"User: {normalized_input} | Bot: {ai_response}"
-            asyncio.create_task(store_memory_in_background(agent, memory_entry, config))
+            asyncio.create_task(store_memory_in_background(memory_entry, config))
+            await profile_updater.aadd_turn(user_input, ai_response)
 
             # Show stored memories (still synchronous for simplicity)
             await print_stored_memories()
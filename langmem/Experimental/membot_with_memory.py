@@ -14,7 +14,7 @@ def embed_func(text):
     return model.encode(text, convert_to_numpy=True)
 
 # Setup Memory
-store = InMemoryStore(index={"dims": 384, "embed": embed_func})
+store = InMemoryStore(index={"dims": 384, "embed": embed_func, "fields": ["content"]})
 
 # Get Azure OpenAI LLM
 llm = get_llm()
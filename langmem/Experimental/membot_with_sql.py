@@ -1,19 +1,23 @@
 """
 MemBot: A context-aware, persistent chatbot using LangGraph and LangMem.
 - Uses Azure ChatGPT for responses.
-- Stores every query and response in InMemoryStore with SQLite backup and all-MiniLM-L12-v2 embeddings.
+- Stores every query and response in IndexedInMemoryStore with SQLite backup and all-MiniLM-L12-v2 embeddings.
 - Maintains full conversation context via persistent messages state.
+- A background sweeper enforces SQLite retention (max-age, max-count, history snapshots) and compacts the file incrementally.
 """
 
 import os
 import sqlite3
 import json
+import time
+import numpy as np
+from datetime import datetime, timezone
 from langgraph.prebuilt import create_react_agent
-from langgraph.store.memory import InMemoryStore
 from langmem import create_manage_memory_tool, create_search_memory_tool
 from sentence_transformers import SentenceTransformer
 from azure_openai_llm import get_llm
-from uuid import uuid4
+from indexed_store import IndexedInMemoryStore, print_memories, put_memory
+from memory_retention import RetentionPolicy, RetentionSweeper, connect, ensure_retention_schema, insert_memory
 
 # Embedding model setup
 embedding_model = SentenceTransformer('all-MiniLM-L12-v2')
@@ -25,12 +29,13 @@ def embed_text(text: str) -> list:
 # SQLite persistence setup
 DB_PATH = "membot_memories.db"
 NAMESPACE = ("user_1",)
+RETENTION = RetentionPolicy(max_age_seconds=90 * 24 * 3600, max_count=5000)  # Default SQLite limits; per-namespace overrides go in RetentionSweeper(policies=...)
 
 # System prompt (moved up)
 SYSTEM_PROMPT = """
 You are MemBot, a helpful assistant with persistent memory. Your goals:
 1. Assist users conversationally.
-2. Use `manage_memory_tool` to store EVERY user query and assistant response as a single memory entry (e.g., "User: I like Python | Bot: Noted, you like Python").
+2. Every user query and assistant response is stored automatically as a single memory entry (e.g., "User: I like Python | Bot: Noted, you like Python"). Use `manage_memory_tool` only to update or delete memories when asked.
 3. Use `search_memory_tool` to retrieve relevant memories when answering questions about past interactions (e.g., "What was my last question?"). If asked about prior queries, search memories and provide the most recent relevant user input.
 Keep responses natural and use the full conversation history (passed in messages) for coherence. If search fails, say so explicitly.
 """
@@ -46,6 +51,12 @@ def init_db():
             value TEXT UNIQUE
         )
     """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS memory_vectors (
+            id TEXT PRIMARY KEY,
+            vector BLOB
+        )
+    """)
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS history (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -55,15 +66,34 @@ def init_db():
     conn.commit()
     conn.close()
 
-def load_from_sqlite(store: InMemoryStore) -> list:
+def load_from_sqlite(store: IndexedInMemoryStore) -> list:
     """Load memories and conversation history from SQLite at startup."""
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
-    # Load memories
-    cursor.execute("SELECT id, namespace, value FROM memories WHERE namespace = ?", (NAMESPACE[0],))
-    for key, ns, value in cursor.fetchall():
-        store._data[(ns,)] = store._data.get((ns,), {})
-        store._data[(ns,)][key] = type('Memory', (), {'value': value})()
+    # Load memories oldest first with their stored vectors (e.g. from batch_ingest.py); embed only rows without one
+    cursor.execute(
+        "SELECT m.id, m.namespace, m.value, m.created_at, v.vector FROM memories m LEFT JOIN memory_vectors v ON v.id = m.id "
+        "WHERE m.namespace = ? ORDER BY m.created_at, m.rowid",
+        (NAMESPACE[0],),
+    )
+    rows = cursor.fetchall()
+    vectors = [np.frombuffer(blob, dtype=np.float32) if blob else None for *_, blob in rows]
+    missing = [i for i, vector in enumerate(vectors) if vector is None]
+    if missing:
+        encoded = embedding_model.encode([rows[i][2] for i in missing], convert_to_numpy=True).astype(np.float32)
+        for i, vector in zip(missing, encoded):
+            vectors[i] = vector
+        # Keep them, so the next startup embeds nothing
+        cursor.executemany(
+            "INSERT OR REPLACE INTO memory_vectors (id, vector) VALUES (?, ?)",
+            [(rows[i][0], vectors[i].tobytes()) for i in missing],
+        )
+        conn.commit()
+    # Keep the SQLite timestamp so a restart doesn't make every memory look new to recency ranking
+    store.bulk_load(
+        ((ns,), key, {"content": value, "created_at": datetime.fromtimestamp(created_at or time.time(), timezone.utc).isoformat()}, vector)
+        for (key, ns, value, created_at, _), vector in zip(rows, vectors)
+    )
     # Load history
     cursor.execute("SELECT messages FROM history ORDER BY id DESC LIMIT 1")
     row = cursor.fetchone()
@@ -71,24 +101,23 @@ def load_from_sqlite(store: InMemoryStore) -> list:
     conn.close()
     return history
 
-def save_to_sqlite(memory_entry: str, history: list):
-    """Save memory and conversation history to SQLite."""
-    conn = sqlite3.connect(DB_PATH)
+def save_to_sqlite(key: str, memory_entry: str, history: list):
+    """Save memory (under its store key) and conversation history to SQLite."""
+    conn = connect(DB_PATH)
     cursor = conn.cursor()
     # Save memory
-    key = str(uuid4())
-    cursor.execute(
-        "INSERT OR IGNORE INTO memories (id, namespace, value) VALUES (?, ?, ?)",
-        (key, NAMESPACE[0], memory_entry)
-    )
+    insert_memory(conn, key, NAMESPACE[0], memory_entry, retention_sweeper.policy_for(NAMESPACE[0]))
     # Save history
     cursor.execute("INSERT INTO history (messages) VALUES (?)", (json.dumps(history),))
     conn.commit()
     conn.close()
 
 # Memory store setup
-memory_store = InMemoryStore(index={"dims": 384, "embed": embed_text})
+memory_store = IndexedInMemoryStore(index={"dims": 384, "embed": embed_text, "fields": ["content"]})
 init_db()
+ensure_retention_schema(DB_PATH)
+retention_sweeper = RetentionSweeper(DB_PATH, default_policy=RETENTION)
+retention_sweeper.start()
 conversation_history = load_from_sqlite(memory_store)
 
 # Azure ChatGPT model
@@ -107,21 +136,8 @@ agent = create_react_agent(
 )
 
 def print_stored_memories() -> None:
-    """Print all memories stored in InMemoryStore, extracting content."""
-    print("\n--- Stored Memories ---")
-    try:
-        all_memories = memory_store._data.get(NAMESPACE, {})
-        if not all_memories:
-            print("No memories stored yet.")
-        else:
-            for i, (key, item) in enumerate(all_memories.items(), 1):
-                value = getattr(item, "value", "None") if item else "None"
-                if isinstance(value, dict) and "content" in value:
-                    value = value["content"]
-                print(f"Memory {i}: Key={key}, Value={value}")
-    except Exception as e:
-        print(f"Error retrieving memories: {e}")
-    print("----------------------\n")
+    """Print the newest page of stored memories."""
+    print_memories(memory_store, NAMESPACE)
 
 def chat_with_membot() -> None:
     """Run an interactive chat loop with MemBot."""
@@ -157,10 +173,8 @@ def chat_with_membot() -> None:
 
             # Store normalized query and response
             memory_entry = f"User: {normalized_input} | Bot: {ai_response}"
-            agent.invoke({
-                "messages": [{"role": "system", "content": f"Use manage_memory_tool to store: {memory_entry}"}]
-            })
-            save_to_sqlite(memory_entry, conversation_history)
+            key = put_memory(memory_store, NAMESPACE, memory_entry)
+            save_to_sqlite(key, memory_entry, conversation_history)
 
             # Show stored memories
             print_stored_memories()
@@ -1,8 +1,10 @@
 """
 MemBot: A context-aware, persistent chatbot using LangGraph and LangMem.
 - Uses Azure ChatGPT for responses.
-- Stores up to 3 conversations in InMemoryStore, batches to SQLite every 3, with all-MiniLM-L12-v2 embeddings.
+- Stores up to 3 conversations in IndexedInMemoryStore (enforced by a per-namespace quota, oldest evicted first), batches to SQLite every 3, with all-MiniLM-L12-v2 embeddings.
 - Maintains full conversation context via persistent messages state.
+- Store and SQLite work runs on worker threads so the event loop never blocks on embedding or disk I/O.
+- A background sweeper enforces SQLite retention (max-age, max-count, history snapshots) and compacts the file incrementally.
 """
 
 import os
@@ -11,10 +13,12 @@ import json
 import asyncio
 from collections import deque
 from langgraph.prebuilt import create_react_agent
-from langgraph.store.memory import InMemoryStore
 from langmem import create_manage_memory_tool, create_search_memory_tool
 from sentence_transformers import SentenceTransformer
 from azure_openai_llm import get_llm
+from indexed_store import FIRST_PATTERN, IndexedInMemoryStore, aput_memory, print_memories, user_text
+from memory_quota import Quota, QuotaManager
+from memory_retention import RetentionPolicy, RetentionSweeper, connect, ensure_retention_schema, insert_memory
 from uuid import uuid4
 
 # Embedding model setup
@@ -26,13 +30,14 @@ def embed_text(text: str) -> list:
 # SQLite persistence setup
 DB_PATH = "membot_memories.db"
 NAMESPACE = ("user_1",)
+RETENTION = RetentionPolicy(max_age_seconds=90 * 24 * 3600, max_count=5000)  # Default SQLite limits; per-namespace overrides go in RetentionSweeper(policies=...)
 MAX_IN_MEMORY = 3
 
 # System prompt
 SYSTEM_PROMPT = """
 You are MemBot, a helpful assistant with persistent memory. Your goals:
 1. Assist users conversationally.
-2. Use `manage_memory_tool` to store EVERY user query and assistant response as a single memory entry.
+2. Every user query and assistant response is stored automatically as a memory with thread, role and date metadata. Use `manage_memory_tool` only to update or delete memories when asked.
 3. For questions about past interactions, ALWAYS use `search_memory_tool` to retrieve relevant memories from InMemoryStore. If no relevant memory is found, indicate it might be in older records and rely on conversation history if available. Return the EXACT user input from the most relevant memory.
 Keep responses natural and use the full conversation history (passed in messages) for coherence.
 """
@@ -56,7 +61,7 @@ def init_db():
     conn.commit()
     conn.close()
 
-def load_from_sqlite(store: InMemoryStore) -> list:
+def load_from_sqlite(store: IndexedInMemoryStore) -> list:
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     cursor.execute("SELECT messages FROM history ORDER BY id DESC LIMIT 1")
@@ -65,20 +70,25 @@ def load_from_sqlite(store: InMemoryStore) -> list:
     conn.close()
     return history
 
-async def save_to_sqlite(memory_queue: deque, history: list):
-    conn = sqlite3.connect(DB_PATH)
+def write_to_sqlite(memory_entries: list, history: list):
+    conn = connect(DB_PATH)
     cursor = conn.cursor()
-    for memory_entry in memory_queue:
+    for memory_entry in memory_entries:
         key = str(uuid4())
-        cursor.execute(
-            "INSERT OR IGNORE INTO memories (id, namespace, value) VALUES (?, ?, ?)",
-            (key, NAMESPACE[0], memory_entry)
-        )
+        insert_memory(conn, key, NAMESPACE[0], memory_entry, retention_sweeper.policy_for(NAMESPACE[0]))
     cursor.execute("INSERT INTO history (messages) VALUES (?)", (json.dumps(history),))
     conn.commit()
     conn.close()
+
+async def save_to_sqlite(memory_queue: deque, history: list):
+    # Snapshot before leaving the loop thread; the chat keeps appending meanwhile
+    memory_entries = list(memory_queue)
+    await asyncio.to_thread(write_to_sqlite, memory_entries, list(history))
+    # Drop only what was written; entries appended during the write wait for the next batch
+    for _ in memory_entries:
+        memory_queue.popleft()
     # Log and verify save
-    print(f"\n--- Saved {len(memory_queue)} memories to SQLite ---")
+    print(f"\n--- Saved {len(memory_entries)} memories to SQLite ---")
     await print_sqlite_memories()
 
 async def print_sqlite_memories():
@@ -101,21 +111,29 @@ async def memory_batcher(agent, config: dict, memory_queue: deque, history: list
         if len(memory_queue) >= MAX_IN_MEMORY:
             print(f"\nBatching {len(memory_queue)} conversations to SQLite...")
             await save_to_sqlite(memory_queue, history)
-            memory_queue.clear()
 
-def search_sqlite(query: str) -> str | None:
+def first_memory_sqlite(namespace: str) -> str | None:
+    """Return the oldest memory of a namespace; served by the (namespace, created_at) index."""
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
-    cursor.execute("SELECT value FROM memories WHERE value LIKE ? ORDER BY id ASC LIMIT 1", (f"%{query}%",))
+    cursor.execute(
+        "SELECT value FROM memories WHERE namespace = ? ORDER BY created_at, rowid LIMIT 1", (namespace,)
+    )
     row = cursor.fetchone()
     conn.close()
     return row[0] if row else None
 
 # Memory store setup
-memory_store = InMemoryStore(index={"dims": 384, "embed": embed_text})
+memory_store = IndexedInMemoryStore(
+    index={"dims": 384, "embed": embed_text, "fields": ["content"]},
+    quota=QuotaManager(default_quota=Quota(max_entries=MAX_IN_MEMORY), eviction="oldest"),
+)
 init_db()
+ensure_retention_schema(DB_PATH)
+retention_sweeper = RetentionSweeper(DB_PATH, default_policy=RETENTION)
+retention_sweeper.start()
 conversation_history = load_from_sqlite(memory_store)
-memory_queue = deque(maxlen=MAX_IN_MEMORY)
+memory_queue = deque()  # Drained by memory_batcher; unbounded so no entry is dropped before it is written
 
 # Azure ChatGPT model
 llm = get_llm()
@@ -133,20 +151,7 @@ agent = create_react_agent(
 )
 
 async def print_stored_memories():
-    print("\n--- Stored Memories (InMemoryStore) ---")
-    try:
-        all_memories = memory_store._data.get(NAMESPACE, {})
-        if not all_memories:
-            print("No memories in InMemoryStore yet.")
-        else:
-            for i, (key, item) in enumerate(all_memories.items(), 1):
-                value = getattr(item, "value", "None") if item else "None"
-                if isinstance(value, dict) and "content" in value:
-                    value = value["content"]
-                print(f"Memory {i}: Key={key}, Value={value}")
-    except Exception as e:
-        print(f"Error retrieving memories: {e}")
-    print("----------------------\n")
+    print_memories(memory_store, NAMESPACE)
 
 async def chat_with_membot():
     global conversation_history
@@ -169,6 +174,16 @@ async def chat_with_membot():
             normalized_input = user_input.lower()
             conversation_history.append({"role": "user", "content": user_input})
 
+            if FIRST_PATTERN.search(normalized_input):
+                # Answer from SQLite directly; only when nothing is flushed yet is the oldest memory still queued
+                first = await asyncio.to_thread(first_memory_sqlite, NAMESPACE[0])
+                if first is None and memory_queue:
+                    first = memory_queue[0]
+                answer = f'Your first message was: "{user_text(first)}"' if first else "I don't have any earlier messages from you yet."
+                print(f"MemBot: {answer}")
+                conversation_history.append({"role": "assistant", "content": answer})
+                continue
+
             response = await agent.ainvoke({"messages": conversation_history}, config=config)
             ai_response = (
                 response["messages"][-1].content
@@ -180,28 +195,13 @@ async def chat_with_membot():
 
             memory_entry = f"User: {normalized_input} | Bot: {ai_response}"
             memory_queue.append(memory_entry)
-            await agent.ainvoke({
-                "messages": [{"role": "system", "content": f"Use manage_memory_tool to store: {memory_entry}"}]
-            }, config=config)
-
-            if len(memory_store._data.get(NAMESPACE, {})) > MAX_IN_MEMORY:
-                oldest_key = min(memory_store._data[NAMESPACE].keys())
-                del memory_store._data[NAMESPACE][oldest_key]
+            await aput_memory(memory_store, NAMESPACE, memory_entry, thread_id=config["configurable"]["thread_id"])
 
             conversation_count += 1
             print(f"Conversation #{conversation_count}")
 
             await print_stored_memories()
 
-            if "what was my first message" in normalized_input:
-                memory = await agent.ainvoke({
-                    "messages": [{"role": "user", "content": user_input}]
-                }, config=config)
-                if "don’t have that information" in memory["messages"][-1].content:
-                    sqlite_result = search_sqlite("User:")
-                    if sqlite_result:
-                        print(f"MemBot (from SQLite): Your first message was: {sqlite_result.split('|')[0].replace('User: ', '')}")
-
     except Exception as e:
         print(f"Error occurred: {e}")
     except KeyboardInterrupt:
@@ -1,16 +1,20 @@
 """
 MemBot: A context-aware chatbot using LangGraph and LangMem with InMemoryStore.
 - Uses Azure ChatGPT for responses.
-- Stores every query and response in InMemoryStore with all-MiniLM-L12-v2 embeddings.
+- Stores every query and response directly as a structured record (thread_id, role, date) in IndexedInMemoryStore with all-MiniLM-L12-v2 embeddings, timestamps and recency-aware ranking.
 - Persists conversation state via MemorySaver checkpointer with thread_id, multi-user support.
+- Accounts memory per user with quotas and oldest-first eviction; type 'usage' to see the top consumers.
+- Keeps a compact per-user profile up to date in the background and passes it to the agent on every turn.
 """
 
 from langgraph.prebuilt import create_react_agent
 from langgraph.checkpoint.memory import MemorySaver
-from langgraph.store.memory import InMemoryStore
 from langmem import create_manage_memory_tool, create_search_memory_tool
 from sentence_transformers import SentenceTransformer
 from azure_openai_llm import get_llm
+from indexed_store import IndexedInMemoryStore, print_memories, put_memory
+from memory_quota import Quota, QuotaManager
+from profile_memory import ProfileUpdater, get_profile, with_profile
 
 # Embedding model setup
 embedding_model = SentenceTransformer('all-MiniLM-L12-v2')
@@ -19,33 +23,27 @@ def embed_text(text: str) -> list:
     """Convert text to embeddings using all-MiniLM-L12-v2."""
     return embedding_model.encode(text, convert_to_numpy=True).tolist()
 
+# Per-user memory quotas
+MAX_MEMORIES_PER_USER = 1000
+MAX_VECTOR_BYTES_PER_USER = 50 * 1024 * 1024
+quota_manager = QuotaManager(
+    default_quota=Quota(max_entries=MAX_MEMORIES_PER_USER, max_vector_bytes=MAX_VECTOR_BYTES_PER_USER),
+    eviction="oldest",
+)
+
 # Global memory store and checkpointer
-memory_store = InMemoryStore(index={"dims": 384, "embed": embed_text})
+memory_store = IndexedInMemoryStore(index={"dims": 384, "embed": embed_text, "fields": ["content"]}, quota=quota_manager)
 checkpointer = MemorySaver()
 
 # Azure ChatGPT model
 llm = get_llm()
 
 # System prompt (minimal)
-SYSTEM_PROMPT = "You are MemBot, a helpful assistant with memory."
+SYSTEM_PROMPT = "You are MemBot, a helpful assistant with memory. Use the user profile, when given, for personal questions."
 
 def print_stored_memories(user_id: str) -> None:
-    """Print all memories stored for a specific user."""
-    namespace = (f"user_{user_id}",)
-    print(f"\n--- Stored Memories for {user_id} ---")
-    try:
-        all_memories = memory_store._data.get(namespace, {})
-        if not all_memories:
-            print("No memories stored yet.")
-        else:
-            for i, (key, item) in enumerate(sorted(all_memories.items(), key=lambda x: x[0]), 1):
-                value = getattr(item, "value", "None") if item else "None"
-                if isinstance(value, dict) and "content" in value:
-                    value = value["content"]
-                print(f"Memory {i}: Key={key}, Value={value}")
-    except Exception as e:
-        print(f"Error retrieving memories: {e}")
-    print("----------------------\n")
+    """Print the newest page of memories stored for a specific user."""
+    print_memories(memory_store, (f"user_{user_id}",))
 
 def chat_with_membot(user_id: str) -> None:
     """Run a synchronous interactive chat loop for a specific user."""
@@ -66,6 +64,7 @@ def chat_with_membot(user_id: str) -> None:
         checkpointer=checkpointer,
         prompt=SYSTEM_PROMPT
     )
+    profile_updater = ProfileUpdater(get_llm(priority="background"), memory_store, namespace)
 
     try:
         while True:
@@ -73,20 +72,22 @@ def chat_with_membot(user_id: str) -> None:
             if user_input.lower() == "exit":
                 print(f"MemBot: Goodbye {user_id}!")
                 break
+            if user_input.lower() == "usage":
+                quota_manager.print_top_consumers()
+                continue
 
             normalized_input = user_input.lower()
             conversation_history.append({"role": "user", "content": user_input})
-            response = agent.invoke({"messages": conversation_history}, config=config)
+            messages = with_profile(conversation_history, get_profile(memory_store, namespace))
+            response = agent.invoke({"messages": messages}, config=config)
             ai_response = response["messages"][-1].content if isinstance(response, dict) else str(response)
             print(f"MemBot: {ai_response}")
 
             conversation_history.append({"role": "assistant", "content": ai_response})
             memory_entry = f"User: {normalized_input} | Bot: {ai_response}"
-            # Store via agent.invoke to avoid __pregel_store error
-            agent.invoke(
-                {"messages": [{"role": "system", "content": f"Use manage_memory_tool to store: {memory_entry}"}]},
-                config=config
-            )
+            # Store directly on the store (tools need the graph context, so calling them here would fail)
+            put_memory(memory_store, namespace, memory_entry, thread_id=config["configurable"]["thread_id"])
+            profile_updater.add_turn(user_input, ai_response)
 
             print_stored_memories(user_id)
 
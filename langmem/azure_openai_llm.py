@@ -1 +1,320 @@
-# Your Azure OpeAi Connection
\ No newline at end of file
+"""
+Shared Azure OpenAI client layer for MemBot.
+- One keep-alive HTTP connection pool shared by every LLM returned from `get_llm()`.
+- Token-bucket rate limiting on both requests-per-minute and tokens-per-minute.
+- Jittered exponential retries on 429/5xx, honouring Azure's retry-after headers.
+- Foreground replies are admitted before background memory work when the budget is tight.
+- Identical in-flight requests are coalesced into one upstream call.
+
+Point AZURE_ENDPOINT at `python mock_azure_server.py` to exercise all of this locally.
+"""
+
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future
+from functools import lru_cache
+
+import httpx
+from dotenv import load_dotenv
+from langchain_openai import AzureChatOpenAI
+
+load_dotenv()
+
+# Azure limits and pool settings (override in .env)
+AZURE_RPM = int(os.getenv("AZURE_RPM", "300"))
+AZURE_TPM = int(os.getenv("AZURE_TPM", "50000"))
+AZURE_MAX_RETRIES = int(os.getenv("AZURE_MAX_RETRIES", "5"))
+AZURE_MAX_CONNECTIONS = int(os.getenv("AZURE_MAX_CONNECTIONS", "20"))
+AZURE_TIMEOUT = float(os.getenv("AZURE_TIMEOUT", "60"))
+DEFAULT_COMPLETION_TOKENS = 256  # Assumed reply size when the request sets no max_tokens
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 30.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Lower value = admitted first
+PRIORITIES = {"foreground": 0, "background": 1}
+
+class TokenBucket:
+    """Refills `per_minute` units evenly over a minute; callers must hold the limiter lock."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` units are available (0 if available now)."""
+        self._refill()
+        amount = min(amount, self.capacity)  # An oversized request waits for a full bucket, not forever
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float) -> None:
+        self._refill()
+        self.level -= min(amount, self.capacity)
+
+    def adjust(self, amount: float) -> None:
+        """Charge (positive) or refund (negative) units after the real usage is known."""
+        self._refill()
+        self.level = min(self.capacity, self.level - amount)
+
+    def drain(self, seconds: float) -> None:
+        """Empty the bucket so nothing is admitted for roughly `seconds` (used on 429)."""
+        self._refill()
+        self.level = min(self.level, -seconds * self.rate)
+
+class RateLimiter:
+    """RPM + TPM token buckets with priority-ordered admission, usable from threads and coroutines."""
+
+    def __init__(self, rpm: int = AZURE_RPM, tpm: int = AZURE_TPM):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self._lock = threading.Condition()
+        self._waiting = []  # heap of (priority, ticket)
+        self._tickets = itertools.count()
+
+    def _try_admit(self, entry: tuple, tokens: int) -> float:
+        """Admit the caller if it is first in line and both buckets allow it; else return the wait."""
+        if self._waiting[0] != entry:
+            return 0.05
+        wait = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+        if wait == 0:
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            heapq.heappop(self._waiting)
+            self._lock.notify_all()
+        return wait
+
+    def acquire(self, tokens: int, priority: str = "foreground") -> None:
+        """Block the calling thread until the request may be sent."""
+        with self._lock:
+            entry = (PRIORITIES[priority], next(self._tickets))
+            heapq.heappush(self._waiting, entry)
+            while True:
+                wait = self._try_admit(entry, tokens)
+                if wait == 0:
+                    return
+                self._lock.wait(timeout=min(wait, 1.0))
+
+    async def aacquire(self, tokens: int, priority: str = "foreground") -> None:
+        """Suspend the calling coroutine until the request may be sent."""
+        with self._lock:
+            entry = (PRIORITIES[priority], next(self._tickets))
+            heapq.heappush(self._waiting, entry)
+        try:
+            while True:
+                with self._lock:
+                    wait = self._try_admit(entry, tokens)
+                if wait == 0:
+                    return
+                await asyncio.sleep(min(wait, 0.05))
+        except asyncio.CancelledError:
+            with self._lock:
+                if entry in self._waiting:
+                    self._waiting.remove(entry)
+                    heapq.heapify(self._waiting)
+                    self._lock.notify_all()
+            raise
+
+    def record_usage(self, estimated: int, actual: int) -> None:
+        with self._lock:
+            self.tokens.adjust(actual - estimated)
+
+    def backoff(self, seconds: float) -> None:
+        with self._lock:
+            self.requests.drain(seconds)
+
+def estimate_tokens(body: bytes) -> int:
+    """Rough prompt + completion token estimate for a chat completions request body."""
+    try:
+        payload = json.loads(body or b"{}")
+    except ValueError:
+        return DEFAULT_COMPLETION_TOKENS
+    prompt_chars = sum(len(json.dumps(m.get("content", ""))) for m in payload.get("messages", []))
+    prompt_chars += len(json.dumps(payload.get("tools", [])))
+    completion = payload.get("max_completion_tokens") or payload.get("max_tokens") or DEFAULT_COMPLETION_TOKENS
+    return prompt_chars // 4 + completion
+
+def retry_delay(attempt: int, response: httpx.Response | None = None) -> float:
+    """Full-jitter exponential backoff, never shorter than the server's retry-after hint."""
+    delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+    if response is not None:
+        if response.headers.get("retry-after-ms"):
+            delay = max(delay, float(response.headers["retry-after-ms"]) / 1000)
+        elif response.headers.get("retry-after", "").replace(".", "", 1).isdigit():
+            delay = max(delay, float(response.headers["retry-after"]))
+    return delay
+
+def _is_stream(body: bytes) -> bool:
+    return b'"stream": true' in body or b'"stream":true' in body
+
+def _copy_response(snapshot: tuple, request: httpx.Request) -> httpx.Response:
+    """Build a fresh response for one caller from a (status, headers, content) snapshot."""
+    status, headers, content = snapshot
+    return httpx.Response(status, headers=headers, content=content, request=request)
+
+def _snapshot(response: httpx.Response) -> tuple:
+    headers = [(k, v) for k, v in response.headers.items() if k.lower() not in ("content-encoding", "content-length")]
+    return response.status_code, headers, response.content
+
+def _record_usage(limiter: RateLimiter, estimated: int, snapshot: tuple) -> None:
+    try:
+        actual = json.loads(snapshot[2]).get("usage", {}).get("total_tokens")
+    except (ValueError, AttributeError):
+        actual = None
+    if actual:
+        limiter.record_usage(estimated, actual)
+
+class RateLimitedTransport(httpx.BaseTransport):
+    """Sync transport: rate limiting, retries and coalescing on top of a shared connection pool."""
+
+    def __init__(self, pool: httpx.BaseTransport, limiter: RateLimiter, priority: str = "foreground"):
+        self._pool = pool
+        self._limiter = limiter
+        self._priority = priority
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        body = request.read()
+        if _is_stream(body):
+            return self._send(request, body, stream=True)
+
+        key = (request.method, str(request.url), body)
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            return _copy_response(future.result(), request)
+        try:
+            snapshot = _snapshot(self._send(request, body))
+            future.set_result(snapshot)
+            return _copy_response(snapshot, request)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    def _send(self, request: httpx.Request, body: bytes, stream: bool = False) -> httpx.Response:
+        estimated = estimate_tokens(body)
+        for attempt in range(AZURE_MAX_RETRIES + 1):
+            self._limiter.acquire(estimated, self._priority)
+            try:
+                response = self._pool.handle_request(request)
+            except httpx.TransportError:
+                if attempt == AZURE_MAX_RETRIES:
+                    raise
+                time.sleep(retry_delay(attempt))
+                continue
+            if response.status_code not in RETRY_STATUSES or attempt == AZURE_MAX_RETRIES:
+                if not stream:
+                    response.read()
+                    _record_usage(self._limiter, estimated, _snapshot(response))
+                return response
+            delay = retry_delay(attempt, response)
+            response.close()
+            if response.status_code == 429:
+                self._limiter.backoff(delay)
+            time.sleep(delay)
+
+    def close(self) -> None:
+        self._pool.close()
+
+class AsyncRateLimitedTransport(httpx.AsyncBaseTransport):
+    """Async transport: rate limiting, retries and coalescing on top of a shared connection pool."""
+
+    def __init__(self, pool: httpx.AsyncBaseTransport, limiter: RateLimiter, priority: str = "foreground"):
+        self._pool = pool
+        self._limiter = limiter
+        self._priority = priority
+        self._inflight = {}
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        body = await request.aread()
+        if _is_stream(body):
+            return await self._send(request, body, stream=True)
+
+        key = (request.method, str(request.url), body)
+        future = self._inflight.get(key)
+        if future is not None:
+            return _copy_response(await asyncio.shield(future), request)
+        future = self._inflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            snapshot = _snapshot(await self._send(request, body))
+            future.set_result(snapshot)
+            return _copy_response(snapshot, request)
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # Mark retrieved so lone leaders don't log "never retrieved"
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _send(self, request: httpx.Request, body: bytes, stream: bool = False) -> httpx.Response:
+        estimated = estimate_tokens(body)
+        for attempt in range(AZURE_MAX_RETRIES + 1):
+            await self._limiter.aacquire(estimated, self._priority)
+            try:
+                response = await self._pool.handle_async_request(request)
+            except httpx.TransportError:
+                if attempt == AZURE_MAX_RETRIES:
+                    raise
+                await asyncio.sleep(retry_delay(attempt))
+                continue
+            if response.status_code not in RETRY_STATUSES or attempt == AZURE_MAX_RETRIES:
+                if not stream:
+                    await response.aread()
+                    _record_usage(self._limiter, estimated, _snapshot(response))
+                return response
+            delay = retry_delay(attempt, response)
+            await response.aclose()
+            if response.status_code == 429:
+                self._limiter.backoff(delay)
+            await asyncio.sleep(delay)
+
+    async def aclose(self) -> None:
+        await self._pool.aclose()
+
+# Shared limiter and keep-alive connection pools
+_LIMITS = httpx.Limits(
+    max_connections=AZURE_MAX_CONNECTIONS,
+    max_keepalive_connections=AZURE_MAX_CONNECTIONS,
+    keepalive_expiry=30.0,
+)
+limiter = RateLimiter(AZURE_RPM, AZURE_TPM)
+_pool = httpx.HTTPTransport(limits=_LIMITS)
+_async_pool = httpx.AsyncHTTPTransport(limits=_LIMITS)
+
+@lru_cache(maxsize=None)
+def get_llm(priority: str = "foreground") -> AzureChatOpenAI:
+    """Return the shared Azure ChatGPT model for a priority class ("foreground" or "background")."""
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown priority {priority!r}; expected one of {list(PRIORITIES)}")
+    return AzureChatOpenAI(
+        azure_deployment=os.getenv("AZURE_MODEL"),
+        azure_endpoint=os.getenv("AZURE_ENDPOINT"),
+        api_version=os.getenv("API_VERSION"),
+        api_key=os.getenv("AZURE_OPEN_AI_API_KEY"),
+        max_retries=0,  # Retries are handled by the transport
+        http_client=httpx.Client(
+            transport=RateLimitedTransport(_pool, limiter, priority), timeout=AZURE_TIMEOUT
+        ),
+        http_async_client=httpx.AsyncClient(
+            transport=AsyncRateLimitedTransport(_async_pool, limiter, priority), timeout=AZURE_TIMEOUT
+        ),
+    )
@@ -0,0 +1,190 @@
+"""
+MemBot batch ingestion: loads archived chat transcripts into MemBot memory offline.
+- Streams transcripts from JSONL, one conversation or exchange per line.
+- Formats every exchange into the same "User: ... | Bot: ..." entries the chat loop stores.
+- Embeds entries in large batches with all-MiniLM-L12-v2 and bulk-writes them to SQLite or an IndexedInMemoryStore.
+- Resumable: the last ingested line per source is committed together with each batch.
+
+Accepted line formats:
+    {"user_id": "pavan", "messages": [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "Hello!"}]}
+    {"user_id": "pavan", "user": "hi", "bot": "Hello!"}
+
+Usage:
+    python batch_ingest.py transcripts.jsonl --db membot_memories.db --batch-size 1024
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import time
+from uuid import uuid4
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+from memory_retention import ensure_retention_schema
+
+# Ingestion settings
+DB_PATH = "membot_memories.db"
+DEFAULT_NAMESPACE = "user_1"
+BATCH_SIZE = 1024  # Entries held in memory, embedded and written per transaction
+ENCODE_BATCH_SIZE = 256  # Sentences per forward pass of the embedding model
+
+# Embedding model setup
+embedding_model = SentenceTransformer('all-MiniLM-L12-v2')
+
+def embed_texts(texts: list) -> np.ndarray:
+    """Convert a batch of texts to float32 embeddings using all-MiniLM-L12-v2."""
+    return embedding_model.encode(
+        texts, batch_size=ENCODE_BATCH_SIZE, convert_to_numpy=True, show_progress_bar=False
+    ).astype(np.float32, copy=False)
+
+def format_entry(user_text: str, bot_text: str) -> str:
+    """Format one exchange exactly like the chat loop does."""
+    return f"User: {user_text.strip().lower()} | Bot: {bot_text.strip()}"
+
+def parse_transcript_line(line: str, default_namespace: str = DEFAULT_NAMESPACE) -> list:
+    """Turn one JSONL transcript line into (namespace, memory_entry) pairs."""
+    record = json.loads(line)
+    namespace = f"user_{record['user_id']}" if record.get("user_id") else default_namespace
+    if "messages" not in record:
+        if record.get("user") and record.get("bot"):
+            return [(namespace, format_entry(record["user"], record["bot"]))]
+        return []
+
+    entries = []
+    pending_user = None
+    for message in record["messages"]:
+        role, content = message.get("role"), message.get("content") or ""
+        if role == "user":
+            pending_user = content
+        elif role == "assistant" and pending_user is not None:
+            entries.append((namespace, format_entry(pending_user, content)))
+            pending_user = None
+    return entries
+
+def iter_batches(path: str, start_line: int, batch_size: int, default_namespace: str):
+    """Stream (last_line_number, entries) batches from a JSONL file, skipping already ingested lines."""
+    batch = []
+    line_no = 0
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if line_no <= start_line or not line.strip():
+                continue
+            try:
+                batch.extend(parse_transcript_line(line, default_namespace))
+            except (json.JSONDecodeError, TypeError, KeyError, AttributeError) as e:
+                print(f"Skipping malformed line {line_no}: {e}")
+                continue
+            if len(batch) >= batch_size:
+                yield line_no, batch
+                batch = []
+    if batch or line_no > start_line:
+        yield line_no, batch
+
+def init_db(conn: sqlite3.Connection) -> None:
+    """Create the memory, vector and progress tables if they don't exist."""
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS memories (
+            id TEXT PRIMARY KEY,
+            namespace TEXT,
+            value TEXT UNIQUE,
+            created_at REAL
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS memory_vectors (
+            id TEXT PRIMARY KEY,
+            vector BLOB
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS ingest_progress (
+            source TEXT PRIMARY KEY,
+            line INTEGER
+        )
+    """)
+    conn.commit()
+
+def get_progress(conn: sqlite3.Connection, source: str) -> int:
+    """Return the last line of source that was fully ingested."""
+    row = conn.execute("SELECT line FROM ingest_progress WHERE source = ?", (source,)).fetchone()
+    return row[0] if row else 0
+
+def write_batch_sqlite(conn: sqlite3.Connection, source: str, line_no: int, entries: list, vectors: np.ndarray) -> int:
+    """Bulk-insert a batch of entries with their vectors and progress in one transaction."""
+    now = time.time()
+    rows = [(str(uuid4()), namespace, entry, now) for namespace, entry in entries]
+    before = conn.total_changes
+    with conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO memories (id, namespace, value, created_at) VALUES (?, ?, ?, ?)", rows
+        )
+        inserted = conn.total_changes - before
+        conn.executemany(
+            "INSERT OR IGNORE INTO memory_vectors (id, vector) "
+            "SELECT ?, ? WHERE EXISTS (SELECT 1 FROM memories WHERE id = ?)",
+            [(key, vector.tobytes(), key) for (key, *_), vector in zip(rows, vectors)],
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO ingest_progress (source, line) VALUES (?, ?)", (source, line_no)
+        )
+    return inserted
+
+def write_batch_store(store, entries: list, vectors: np.ndarray) -> int:
+    """Bulk-load a batch of entries with precomputed vectors into an IndexedInMemoryStore, skipping re-embedding.
+    The vectors embed the entry text, the same input as live puts to a store indexed with fields=["content"]."""
+    return store.bulk_load(
+        ((namespace,), str(uuid4()), {"content": entry}, vector.tolist())
+        for (namespace, entry), vector in zip(entries, vectors)
+    )
+
+def ingest(path: str, db_path: str = DB_PATH, store=None, batch_size: int = BATCH_SIZE,
+           default_namespace: str = DEFAULT_NAMESPACE) -> int:
+    """Ingest a JSONL transcript file into SQLite, or into `store` when one is given."""
+    source = os.path.abspath(path)
+    conn = None
+    start_line = 0
+    if store is None:
+        conn = sqlite3.connect(db_path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        init_db(conn)
+        ensure_retention_schema(db_path)  # Adds created_at to databases created before it existed
+        start_line = get_progress(conn, source)
+        if start_line:
+            print(f"Resuming {path} after line {start_line}")
+
+    total = 0
+    started = time.perf_counter()
+    try:
+        for line_no, entries in iter_batches(path, start_line, batch_size, default_namespace):
+            vectors = embed_texts([entry for _, entry in entries]) if entries else np.empty((0, 384), np.float32)
+            if store is None:
+                total += write_batch_sqlite(conn, source, line_no, entries, vectors)
+            else:
+                total += write_batch_store(store, entries, vectors)
+            elapsed = time.perf_counter() - started
+            print(f"Line {line_no}: {total} entries ingested ({total / max(elapsed, 1e-9):.0f} entries/s)")
+    finally:
+        if conn is not None:
+            conn.close()
+    print(f"Done: {total} entries from {path} in {time.perf_counter() - started:.1f}s")
+    return total
+
+def main():
+    """Parse command line arguments and ingest each transcript file."""
+    parser = argparse.ArgumentParser(description="Bulk-load chat transcripts into MemBot memory.")
+    parser.add_argument("paths", nargs="+", help="JSONL transcript files")
+    parser.add_argument("--db", default=DB_PATH, help="SQLite database to write to")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Entries per embedding/write batch")
+    parser.add_argument("--namespace", default=DEFAULT_NAMESPACE, help="Namespace for lines without a user_id")
+    args = parser.parse_args()
+
+    for path in args.paths:
+        ingest(path, db_path=args.db, batch_size=args.batch_size, default_namespace=args.namespace)
+
+if __name__ == "__main__":
+    main()
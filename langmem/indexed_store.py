@@ -0,0 +1,526 @@
+"""
+IndexedInMemoryStore: an InMemoryStore that keeps MemBot memories ordered and ranked.
+- Stamps every memory with an immutable `created_at` timestamp and a monotonically increasing `seq`.
+- Maintains a per-namespace chronological index so "first/last message" questions skip the LLM.
+- Re-ranks similarity search results with recency decay and access frequency (see memory_ranking.py).
+- Optionally accounts usage per namespace and enforces quotas (see memory_quota.py).
+- Indexes metadata fields (thread_id, role, topic, date) so filtered search and listing touch only matching memories.
+- Cursor-paginated browsing (list_memories) served from the chronological index instead of sorting the namespace.
+- Async-native: aput/asearch run embedding and vector search on a dedicated, bounded thread pool, never on the event loop.
+- Optionally appends every put and delete, with vectors, to a change log that read replicas tail (see memory_replication.py).
+"""
+
+import asyncio
+import functools
+import itertools
+import re
+import threading
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from uuid import uuid4
+
+from langgraph.store.base import Item, PutOp, SearchOp
+from langgraph.store.memory import InMemoryStore, _compare_values
+
+from memory_quota import QuotaExceededError
+from memory_ranking import RECENCY_HALF_LIFE_HOURS, rank_items
+
+# Search settings
+SEARCH_OVERSAMPLE = 3  # Similarity candidates fetched per requested result before re-ranking
+STORE_MAX_WORKERS = 4  # Concurrent async store operations (embedding + search) off the event loop
+LIST_PAGE_SIZE = 20  # Memories per page when browsing a namespace
+
+# Metadata fields with an inverted index; filters on them skip the full namespace scan
+INDEXED_FIELDS = ("thread_id", "role", "topic", "date")
+RANGE_OPERATORS = {"$eq", "$gt", "$gte", "$lt", "$lte"}
+
+# Chronological questions answered straight from the index; only questions about the user's own
+# messages ("what was my first message?") qualify, not any mention of a first or previous message
+FIRST_PATTERN = re.compile(
+    r"\b(what|which)\b[^.?!]*\bmy\s+(very\s+)?(first|earliest)\s+(message|question|query)\b", re.IGNORECASE
+)
+LAST_PATTERN = re.compile(
+    r"\b(what|which)\b[^.?!]*\bmy\s+(last|latest|previous|most recent)\s+(message|question|query)\b", re.IGNORECASE
+)
+
+class ChronologicalIndex:
+    """Per-namespace memory keys kept sorted by sequence number."""
+
+    def __init__(self):
+        self._seqs = defaultdict(list)
+        self._keys = defaultdict(list)
+        self._seq_of = defaultdict(dict)
+
+    def add(self, namespace: tuple, key: str, seq: int) -> None:
+        """Insert a key at its sequence position (O(1) for the usual append)."""
+        if key in self._seq_of[namespace]:
+            self.remove(namespace, key)
+        seqs = self._seqs[namespace]
+        i = bisect_right(seqs, seq)
+        seqs.insert(i, seq)
+        self._keys[namespace].insert(i, key)
+        self._seq_of[namespace][key] = seq
+
+    def remove(self, namespace: tuple, key: str) -> None:
+        """Drop a key from the index if present."""
+        seq = self._seq_of[namespace].pop(key, None)
+        if seq is None:
+            return
+        seqs = self._seqs[namespace]
+        i = bisect_left(seqs, seq)
+        del seqs[i]
+        del self._keys[namespace][i]
+
+    def first(self, namespace: tuple, n: int = 1) -> list:
+        """Return the n oldest keys, oldest first."""
+        return self._keys[namespace][:n]
+
+    def last(self, namespace: tuple, n: int = 1) -> list:
+        """Return the n newest keys, newest first."""
+        return self._keys[namespace][-n:][::-1] if n > 0 else []
+
+    def page(self, namespace: tuple, after: int | None = None, n: int = LIST_PAGE_SIZE,
+             descending: bool = False) -> list:
+        """Return up to n (seq, key) pairs that come after sequence number `after` in the given direction."""
+        seqs, keys = self._seqs[namespace], self._keys[namespace]
+        if descending:
+            end = len(seqs) if after is None else bisect_left(seqs, after)
+            start = max(end - n, 0)
+            return list(zip(seqs[start:end], keys[start:end]))[::-1]
+        start = 0 if after is None else bisect_right(seqs, after)
+        return list(zip(seqs[start:start + n], keys[start:start + n]))
+
+    def seq_of(self, namespace: tuple, key: str) -> int | None:
+        """Return the sequence number of a key."""
+        return self._seq_of[namespace].get(key)
+
+    def count(self, namespace: tuple) -> int:
+        """Return the number of indexed keys in a namespace."""
+        return len(self._keys[namespace])
+
+def _value_kind(value) -> str:
+    """Ordering class of an indexed value: "str" or "number" (bool and int compare with float)."""
+    return "str" if isinstance(value, str) else "number"
+
+class MetadataIndex:
+    """Per-namespace inverted index from metadata field values to memory keys."""
+
+    def __init__(self, fields=INDEXED_FIELDS):
+        self.fields = tuple(fields)
+        self._postings = defaultdict(lambda: defaultdict(dict))  # [ns][field][value] -> set of keys
+        # [ns][field][kind] -> distinct values, sorted; strings and numbers are kept apart so they never compare
+        self._sorted_values = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
+        self._entries = defaultdict(dict)  # [ns][key] -> {field: value}
+
+    def add(self, namespace: tuple, key: str, value: dict) -> None:
+        """Index the metadata fields of a memory, replacing any previous entry for the key."""
+        self.remove(namespace, key)
+        entry = {}
+        for field in self.fields:
+            field_value = value.get(field)
+            if field_value is None or not isinstance(field_value, (str, int, float, bool)):
+                continue
+            postings = self._postings[namespace][field]
+            if field_value not in postings:
+                postings[field_value] = set()
+                insort(self._sorted_values[namespace][field][_value_kind(field_value)], field_value)
+            postings[field_value].add(key)
+            entry[field] = field_value
+        if entry:
+            self._entries[namespace][key] = entry
+
+    def remove(self, namespace: tuple, key: str) -> None:
+        """Drop a memory from the index if present."""
+        entry = self._entries[namespace].pop(key, None)
+        for field, field_value in (entry or {}).items():
+            postings = self._postings[namespace][field]
+            postings[field_value].discard(key)
+            if not postings[field_value]:
+                del postings[field_value]
+                values = self._sorted_values[namespace][field][_value_kind(field_value)]
+                del values[bisect_left(values, field_value)]
+
+    def servable(self, filter: dict | None) -> dict:
+        """Return the filter conditions this index can answer (equality or $eq/$gt/$gte/$lt/$lte ranges)."""
+        conditions = {}
+        for field, condition in (filter or {}).items():
+            if field not in self.fields:
+                continue
+            if isinstance(condition, dict):
+                if condition and set(condition) <= RANGE_OPERATORS:
+                    conditions[field] = condition
+            elif isinstance(condition, (str, int, float, bool)):
+                conditions[field] = condition
+        return conditions
+
+    def lookup(self, namespace: tuple, conditions: dict) -> set:
+        """Return the keys in a namespace matching all conditions, intersecting the smallest sets first."""
+        matches = sorted((self._match(namespace, f, c) for f, c in conditions.items()), key=len)
+        if not matches:
+            return set()
+        result = set(matches[0])
+        for keys in matches[1:]:
+            result &= keys
+            if not result:
+                break
+        return result
+
+    def _match(self, namespace: tuple, field: str, condition) -> set:
+        postings = self._postings[namespace][field]
+        if not isinstance(condition, dict):
+            return postings.get(condition, set())
+        if "$eq" in condition:
+            keys = postings.get(condition["$eq"], set())
+            return keys if len(condition) == 1 else keys & self._match(
+                namespace, field, {k: v for k, v in condition.items() if k != "$eq"}
+            )
+        kinds = {_value_kind(bound) for op, bound in condition.items()}
+        if len(kinds) != 1:
+            return set()  # Bounds of different types never match together
+        values = self._sorted_values[namespace][field][kinds.pop()]
+        try:
+            lo = bisect_right(values, condition["$gt"]) if "$gt" in condition else 0
+            if "$gte" in condition:
+                lo = max(lo, bisect_left(values, condition["$gte"]))
+            hi = bisect_left(values, condition["$lt"]) if "$lt" in condition else len(values)
+            if "$lte" in condition:
+                hi = min(hi, bisect_right(values, condition["$lte"]))
+        except TypeError:
+            return set()  # Bound of a different type than the indexed values
+        keys = set()
+        for field_value in values[lo:hi]:
+            keys |= postings[field_value]
+        return keys
+
+class ReadOnlyStoreError(Exception):
+    """Raised when a read replica is asked to write; memory writes belong on the primary."""
+
+class IndexedInMemoryStore(InMemoryStore):
+    """InMemoryStore with ordered timestamps, a chronological index and recency-aware search."""
+
+    def __init__(self, *, index=None, half_life_hours: float = RECENCY_HALF_LIFE_HOURS,
+                 oversample: int = SEARCH_OVERSAMPLE, quota=None, max_workers: int = STORE_MAX_WORKERS,
+                 change_log=None, read_only: bool = False):
+        super().__init__(index=index)
+        self.chrono = ChronologicalIndex()
+        self.quota = quota  # Optional QuotaManager
+        self.change_log = change_log  # Optional ChangeLog for read replicas
+        self.read_only = read_only  # Replica: only replicated changes (bulk_load / bulk_delete) may write
+        self.metadata = MetadataIndex()
+        self.half_life_hours = half_life_hours
+        self.oversample = oversample
+        self._access = defaultdict(Counter)  # [ns][key] -> times a search result was used
+        self._seq = itertools.count(1)
+        self._last_seq = 0
+        self._lock = threading.RLock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="memory-store")
+
+    def batch(self, ops, *, count_access: bool = True):
+        # Only reads of shared state and writes hold the lock; embedding and scoring run unlocked
+        # so concurrent operations from the async pool overlap.
+        ops, widened = self._widen_search_ops(ops)
+        if self.read_only and any(isinstance(op, PutOp) for op in ops):
+            raise ReadOnlyStoreError("This memory store is a read replica; send memory writes to the primary.")
+        with self._lock:
+            results, put_ops, search_ops = self._prepare_ops(ops)
+        if search_ops:
+            query_vectors = self._embed_search_queries(search_ops)
+            self._batch_search(search_ops, query_vectors, results)
+
+        to_embed = self._extract_texts(put_ops)
+        embeddings = None
+        if to_embed and self.index_config and self.embeddings:
+            embeddings = self.embeddings.embed_documents(list(to_embed))
+        with self._lock:
+            previous = self._snapshot(put_ops)
+            if embeddings is not None:
+                self._insertinmem_store(to_embed, embeddings)
+            self._apply_put_ops(put_ops, previous)
+            return self._rerank(widened, results, count_access)
+
+    async def abatch(self, ops, *, count_access: bool = True):
+        # Run the whole operation on the store's bounded pool so the event loop stays responsive
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, functools.partial(self.batch, list(ops), count_access=count_access)
+        )
+
+    def search(self, namespace_prefix: tuple, /, *, query: str | None = None, filter: dict | None = None,
+               limit: int = 10, offset: int = 0, refresh_ttl: bool | None = None, count_access: bool = True) -> list:
+        """BaseStore.search; count_access=False leaves hit counts alone for speculative searches (e.g. prefetch),
+        whose callers report the results they actually use with record_access."""
+        op = SearchOp(namespace_prefix=namespace_prefix, filter=filter, limit=limit, offset=offset, query=query)
+        return self.batch([op], count_access=count_access)[0]
+
+    async def asearch(self, namespace_prefix: tuple, /, *, query: str | None = None, filter: dict | None = None,
+                      limit: int = 10, offset: int = 0, refresh_ttl: bool | None = None,
+                      count_access: bool = True) -> list:
+        """Async variant of search."""
+        op = SearchOp(namespace_prefix=namespace_prefix, filter=filter, limit=limit, offset=offset, query=query)
+        return (await self.abatch([op], count_access=count_access))[0]
+
+    def record_access(self, items) -> None:
+        """Count search results that were used, for least-used eviction and frequency ranking."""
+        with self._lock:
+            for item in items:
+                if item.key in self._data[item.namespace]:
+                    self._access[item.namespace][item.key] += 1
+
+    def bulk_load(self, records) -> int:
+        """Insert (namespace, key, value, vector) records with precomputed vectors, skipping re-embedding.
+
+        `vector` is one vector for the indexed field (index fields=["content"]: the content text), a {path: vector}
+        dict, or None.
+        """
+        count = 0
+        with self._lock:
+            for namespace, key, value, vector in records:
+                previous = self._snapshot([(namespace, key)])
+                value = self._stamp(namespace, key, value)
+                now = datetime.now(timezone.utc)
+                self._data[namespace][key] = Item(
+                    value=value, key=key, namespace=namespace,
+                    created_at=datetime.fromisoformat(value["created_at"]), updated_at=now,
+                )
+                if isinstance(vector, dict):
+                    self._vectors[namespace][key] = {path: list(v) for path, v in vector.items()}
+                elif vector is not None:
+                    self._vectors[namespace][key][self._vector_path()] = list(vector)
+                self._index_put(namespace, key, value)
+                self._enforce_quota(namespace, key, previous)
+                count += 1
+        return count
+
+    def list_memories(self, namespace: tuple, *, cursor: str | None = None, page_size: int = LIST_PAGE_SIZE,
+                      order: str = "asc") -> tuple:
+        """Return one page of memories in sequence order ("asc" oldest first, "desc" newest first) and the
+        cursor for the next page, or None on the last page. Each page costs O(log n + page_size)."""
+        if order not in ("asc", "desc"):
+            raise ValueError(f"order must be 'asc' or 'desc', not {order!r}")
+        if page_size < 1:
+            raise ValueError(f"page_size must be at least 1, not {page_size}")
+        try:
+            after = int(cursor) if cursor is not None else None
+        except (TypeError, ValueError):
+            raise ValueError(f"cursor must be one returned by list_memories, not {cursor!r}") from None
+        with self._lock:
+            entries = self.chrono.page(namespace, after, page_size + 1, descending=order == "desc")
+            items = [self._data[namespace][key] for _, key in entries[:page_size]]
+        next_cursor = str(entries[page_size - 1][0]) if len(entries) > page_size else None
+        return items, next_cursor
+
+    def bulk_delete(self, records) -> int:
+        """Delete (namespace, key) records directly, e.g. replicated deletes on a read-only replica."""
+        count = 0
+        with self._lock:
+            for namespace, key in records:
+                if key in self._data[namespace]:
+                    self._evict(namespace, key)
+                    count += 1
+        return count
+
+    # Helpers
+
+    def _vector_path(self) -> str:
+        """Path a single precomputed vector is stored under: the one indexed field (e.g. "content"), else "$"."""
+        fields = (self.index_config or {}).get("fields") or ["$"]
+        return fields[0] if len(fields) == 1 else "$"
+
+    def _next_seq(self) -> int:
+        self._last_seq = next(self._seq)
+        return self._last_seq
+
+    def _stamp(self, namespace: tuple, key: str, value: dict) -> dict:
+        """Preserve created_at/seq across updates and assign them to new memories."""
+        existing = self._data[namespace].get(key)
+        if existing is not None and "seq" in existing.value:
+            return {**value, "created_at": existing.value["created_at"], "seq": existing.value["seq"]}
+        if "seq" in value and "created_at" in value:
+            # Pre-stamped (e.g. loaded or replicated); keep future sequence numbers above it
+            while self._last_seq < value["seq"]:
+                self._next_seq()
+            return value
+        if "created_at" in value:
+            # Timestamp persisted elsewhere (e.g. SQLite); load oldest first so seq follows created_at
+            return {**value, "seq": self._next_seq()}
+        return {**value, "created_at": datetime.now(timezone.utc).isoformat(), "seq": self._next_seq()}
+
+    def _index_put(self, namespace: tuple, key: str, value: dict) -> None:
+        self.chrono.add(namespace, key, value["seq"])
+        self.metadata.add(namespace, key, value)
+        if self.quota is not None:
+            self.quota.record_put(namespace, key, value, self._vectors[namespace].get(key))
+        if self.change_log is not None:
+            self.change_log.append("put", namespace, key, value, self._vectors[namespace].get(key))
+
+    def _index_delete(self, namespace: tuple, key: str) -> None:
+        self.chrono.remove(namespace, key)
+        self.metadata.remove(namespace, key)
+        self._access[namespace].pop(key, None)
+        if self.quota is not None:
+            self.quota.record_delete(namespace, key)
+        if self.change_log is not None:
+            self.change_log.append("delete", namespace, key)
+
+    def _evict(self, namespace: tuple, key: str) -> None:
+        self._data[namespace].pop(key, None)
+        self._vectors[namespace].pop(key, None)
+        self._index_delete(namespace, key)
+
+    def _snapshot(self, keys) -> dict:
+        """Capture the current item and vectors of each (namespace, key) so a rejected write can be undone."""
+        return {
+            (namespace, key): (self._data[namespace].get(key), dict(self._vectors[namespace].get(key) or {}))
+            for namespace, key in keys
+        }
+
+    def _restore(self, namespace: tuple, key: str, previous: tuple) -> None:
+        """Put back a memory captured by _snapshot, or remove the key if it did not exist."""
+        item, vectors = previous
+        if item is None:
+            self._evict(namespace, key)
+            return
+        self._data[namespace][key] = item
+        self._vectors[namespace].pop(key, None)
+        if vectors:
+            self._vectors[namespace][key] = vectors
+        self._index_put(namespace, key, item.value)
+
+    def _enforce_quota(self, namespace: tuple, new_key: str, previous: dict | None = None) -> None:
+        """Evict per the namespace's policy until it is within quota; reject the new memory if it can't.
+        A rejected update leaves the previous value and vectors in place."""
+        if self.quota is None:
+            return
+        policy = self.quota.policy_for(namespace)
+        while self.quota.is_over(namespace):
+            victim = policy(self, namespace, new_key)
+            if victim is None:
+                self._restore(namespace, new_key, (previous or {}).get((namespace, new_key), (None, None)))
+                raise QuotaExceededError(
+                    f"No room for memory {new_key} in {namespace} under its quota (usage: {self.quota.usage(namespace)})"
+                )
+            self._evict(namespace, victim)
+
+    def _apply_put_ops(self, put_ops, previous: dict | None = None) -> None:
+        stamped = {}
+        for (namespace, key), op in put_ops.items():
+            if op.value is None:
+                stamped[(namespace, key)] = op
+            else:
+                stamped[(namespace, key)] = op._replace(value=self._stamp(namespace, key, op.value))
+        super()._apply_put_ops(stamped)
+        for (namespace, key), op in stamped.items():
+            if op.value is None:
+                self._index_delete(namespace, key)
+            else:
+                self._data[namespace][key].created_at = datetime.fromisoformat(op.value["created_at"])
+                self._index_put(namespace, key, op.value)
+        for (namespace, key), op in stamped.items():
+            if op.value is not None:
+                self._enforce_quota(namespace, key, previous)
+
+    def _filter_items(self, op: SearchOp) -> list:
+        """Serve indexed filter conditions from the metadata index; scan only the matching memories."""
+        conditions = self.metadata.servable(op.filter)
+        if not conditions:
+            return super()._filter_items(op)
+        remaining = {k: v for k, v in op.filter.items() if k not in conditions}
+        prefix = op.namespace_prefix
+        filtered = []
+        for namespace in list(self._data):
+            if namespace[:len(prefix)] != prefix:
+                continue
+            keys = self.metadata.lookup(namespace, conditions)
+            for key in sorted(keys, key=lambda k: self.chrono.seq_of(namespace, k) or 0):
+                item = self._data[namespace].get(key)
+                if item is None or not all(_compare_values(item.value.get(f), v) for f, v in remaining.items()):
+                    continue
+                if op.query and (embeddings := self._vectors[namespace].get(key)):
+                    filtered.append((item, list(embeddings.values())))
+                else:
+                    filtered.append((item, []))
+        return filtered
+
+    def _widen_search_ops(self, ops):
+        """Fetch an oversampled similarity shortlist for query searches so re-ranking has room to work."""
+        ops = list(ops)
+        widened = {}
+        for i, op in enumerate(ops):
+            if isinstance(op, SearchOp) and op.query:
+                widened[i] = op
+                ops[i] = op._replace(limit=(op.offset + op.limit) * self.oversample, offset=0)
+        return ops, widened
+
+    def _rerank(self, widened: dict, results: list, count_access: bool = True) -> list:
+        for i, op in widened.items():
+            if not results[i]:
+                continue
+            hits = {item.key: self._access[item.namespace][item.key] for item in results[i]}
+            ranked = rank_items(results[i], hits, half_life_hours=self.half_life_hours)
+            results[i] = ranked[op.offset:op.offset + op.limit]
+            if count_access:
+                self.record_access(results[i])
+        return results
+
+def memory_record(content: str, *, thread_id: str | None = None, role: str = "exchange",
+                  topic: str | None = None) -> dict:
+    """Build a structured memory value; metadata fields are indexed by IndexedInMemoryStore."""
+    value = {
+        "content": content,
+        "thread_id": thread_id,
+        "role": role,
+        "topic": topic,
+        "date": datetime.now(timezone.utc).date().isoformat(),
+    }
+    return {k: v for k, v in value.items() if v is not None}
+
+def put_memory(store: IndexedInMemoryStore, namespace: tuple, content: str, **metadata) -> str:
+    """Store a structured memory record directly (no LLM tool call) and return its key."""
+    key = str(uuid4())
+    store.put(namespace, key, memory_record(content, **metadata))
+    return key
+
+async def aput_memory(store: IndexedInMemoryStore, namespace: tuple, content: str, **metadata) -> str:
+    """Async variant of put_memory."""
+    key = str(uuid4())
+    await store.aput(namespace, key, memory_record(content, **metadata))
+    return key
+
+def memory_content(item) -> str:
+    """Extract the text of a stored memory."""
+    value = getattr(item, "value", None)
+    if isinstance(value, dict) and "content" in value:
+        return str(value["content"])
+    return str(value)
+
+def print_memories(store: IndexedInMemoryStore, namespace: tuple, *, cursor: str | None = None,
+                   page_size: int = LIST_PAGE_SIZE, order: str = "desc") -> str | None:
+    """Print one page of a namespace's memories (newest first by default) and return the next page's cursor."""
+    items, next_cursor = store.list_memories(namespace, cursor=cursor, page_size=page_size, order=order)
+    print(f"\n--- Stored Memories for {'/'.join(namespace)} ({len(items)} of {store.chrono.count(namespace)}) ---")
+    if not items:
+        print("No memories stored yet.")
+    for item in items:
+        print(f"Memory {item.value.get('seq')}: Key={item.key}, Value={memory_content(item)}")
+    if next_cursor is not None:
+        print(f"(more: cursor={next_cursor})")
+    print("----------------------\n")
+    return next_cursor
+
+def user_text(content: str) -> str:
+    """Return the user part of a "User: ... | Bot: ..." memory entry."""
+    return content.split(" | Bot:")[0].replace("User: ", "", 1).strip()
+
+def answer_chronological_query(store: IndexedInMemoryStore, namespace: tuple, query: str) -> str | None:
+    """Answer "first/last message" questions from the chronological index, or return None."""
+    if FIRST_PATTERN.search(query):
+        keys, label = store.chrono.first(namespace), "first"
+    elif LAST_PATTERN.search(query):
+        keys, label = store.chrono.last(namespace), "last"
+    else:
+        return None
+    if not keys:
+        return "I don't have any earlier messages from you yet."
+    item = store.get(namespace, keys[0])
+    return f'Your {label} message was: "{user_text(memory_content(item))}"'
@@ -1,17 +1,25 @@
 """
 MemBot: A context-aware chatbot using LangGraph and LangMem with InMemorySaver.
 - Uses Azure ChatGPT for responses.
-- Stores every query and response in InMemoryStore with all-MiniLM-L12-v2 embeddings.
+- Stores every query and response directly as a structured record (thread_id, role, date) in IndexedInMemoryStore with all-MiniLM-L12-v2 embeddings, timestamps and recency-aware ranking.
 - Persists messages state in-memory via thread_id and InMemorySaver.
+- Prefetches the top-k relevant memories in parallel with prompt preparation on every turn.
+- Keeps a compact user profile up to date in the background and passes it to the agent on every turn.
+- Routes memory-free turns to a single direct LLM call; only memory-relevant turns use the ReAct tool loop.
+- Optionally publishes memory changes to a change log (MEMBOT_CHANGE_LOG) or follows another node's log as a read replica (MEMBOT_REPLICATE_FROM).
 """
 
 import os
 from langgraph.prebuilt import create_react_agent
 from langgraph.checkpoint.memory import MemorySaver
-from langgraph.store.memory import InMemoryStore
 from langmem import create_manage_memory_tool, create_search_memory_tool
 from sentence_transformers import SentenceTransformer
 from azure_openai_llm import get_llm
+from memory_prefetch import start_prefetch, collect_prefetch, with_memories
+from indexed_store import IndexedInMemoryStore, answer_chronological_query, print_memories, put_memory
+from profile_memory import ProfileUpdater, get_profile, with_profile
+from memory_router import MemoryRouter
+from memory_replication import ChangeLog, start_replica
 
 # Embedding model setup
 embedding_model = SentenceTransformer('all-MiniLM-L12-v2')
@@ -22,12 +30,26 @@ def embed_text(text: str) -> list:
 
 # Memory store and checkpointer setup
 NAMESPACE = ("user_1",)
-memory_store = InMemoryStore(index={"dims": 384, "embed": embed_text})
+CHANGE_LOG_PATH = os.getenv("MEMBOT_CHANGE_LOG")  # Publish memory changes for read replicas
+REPLICATE_FROM = os.getenv("MEMBOT_REPLICATE_FROM")  # Primary's change log path or tcp://host:port
+memory_store = IndexedInMemoryStore(
+    index={"dims": 384, "embed": embed_text, "fields": ["content"]},
+    change_log=ChangeLog(CHANGE_LOG_PATH) if CHANGE_LOG_PATH else None,
+    read_only=bool(REPLICATE_FROM),  # Replicas only serve reads; their writes would never reach other nodes
+)
+if REPLICATE_FROM:
+    replica = start_replica(memory_store, REPLICATE_FROM)
 checkpointer = MemorySaver()  # In-memory persistence for messages state
 
 # Azure ChatGPT model
 llm = get_llm()
 
+# Background profile maintenance
+profile_updater = ProfileUpdater(get_llm(priority="background"), memory_store, NAMESPACE)
+
+# Fast-path router built on the same MiniLM embedder
+router = MemoryRouter(embed_text)
+
 # Memory tools
 manage_memory_tool = create_manage_memory_tool(namespace=NAMESPACE)
 search_memory_tool = create_search_memory_tool(namespace=NAMESPACE)
@@ -36,36 +58,58 @@ search_memory_tool = create_search_memory_tool(namespace=NAMESPACE)
 SYSTEM_PROMPT = """
 You are MemBot, a helpful assistant with memory. Your goals:
 1. Assist users conversationally.
-2. Use `manage_memory_tool` to store EVERY user query and assistant response as a single memory entry.
-3. For questions about past interactions, ALWAYS use `search_memory_tool` to retrieve relevant memories.
+2. Every user query and assistant response is stored automatically as a memory with thread, role and date metadata. Use `manage_memory_tool` only to update or delete memories when asked.
+3. Relevant memories are prefetched and passed to you as a system message. Answer from them when they suffice; for questions about past interactions they don't cover, use `search_memory_tool` to retrieve more.
+4. A profile of known facts about the user may be passed as a system message; use it for personal questions ("what do you know about me") instead of searching.
 Keep responses natural and use the full conversation history (passed in messages) for coherence.
 """
 
 # Agent setup
 agent = create_react_agent(
     model=llm,
-    tools=[manage_memory_tool, search_memory_tool],
+    tools=[search_memory_tool] if memory_store.read_only else [manage_memory_tool, search_memory_tool],
     store=memory_store,
     checkpointer=checkpointer,
     prompt=SYSTEM_PROMPT
 )
 
 def print_stored_memories() -> None:
-    """Print all memories stored in InMemoryStore, extracting content."""
-    print("\n--- Stored Memories ---")
-    try:
-        all_memories = memory_store._data.get(NAMESPACE, {})
-        if not all_memories:
-            print("No memories stored yet.")
-        else:
-            for i, (key, item) in enumerate(sorted(all_memories.items(), key=lambda x: x[0]), 1):
-                value = getattr(item, "value", "None") if item else "None"
-                if isinstance(value, dict) and "content" in value:
-                    value = value["content"]
-                print(f"Memory {i}: Key={key}, Value={value}")
-    except Exception as e:
-        print(f"Error retrieving memories: {e}")
-    print("----------------------\n")
+    """Print the newest page of stored memories."""
+    print_memories(memory_store, NAMESPACE)
+
+def store_turn(user_input: str, ai_response: str, thread_id: str) -> None:
+    """Store an exchange as a structured memory and feed the profile; read replicas leave this to the primary."""
+    if memory_store.read_only:
+        return
+    memory_entry = f"User: {user_input.lower()} | Bot: {ai_response}"
+    put_memory(memory_store, NAMESPACE, memory_entry, thread_id=thread_id)
+    profile_updater.add_turn(user_input, ai_response)
+
+def generate_reply(conversation_history: list, config: dict) -> str:
+    """Answer the latest user turn, via a direct LLM call or the tool-enabled agent depending on the route."""
+    user_input = conversation_history[-1]["content"]
+
+    # Prefetch relevant memories while the turn is routed and the prompt is prepared
+    prefetch = start_prefetch(memory_store, NAMESPACE, user_input)
+    profile = get_profile(memory_store, NAMESPACE)
+
+    if router.route(user_input) == "direct":
+        prefetch.cancel()  # Result unused on the direct path; skips the search if it has not started
+        # Same persona and instructions as the agent, which receives SYSTEM_PROMPT via `prompt`
+        system = {"role": "system", "content": SYSTEM_PROMPT}
+        history = [m for m in conversation_history if m != system]
+        return llm.invoke(with_profile([system] + history, profile)).content
+
+    messages = with_profile(conversation_history, profile)
+    memories = collect_prefetch(prefetch)
+    memory_store.record_access(memories)
+    messages = with_memories(messages, memories)
+    response = agent.invoke({"messages": messages}, config=config)
+    return (
+        response["messages"][-1].content
+        if isinstance(response, dict) and "messages" in response
+        else str(response)
+    )
 
 def chat_with_membot() -> None:
     """Run an interactive chat loop with MemBot."""
@@ -80,32 +124,26 @@ def chat_with_membot() -> None:
                 print("MemBot: Goodbye!")
                 break
 
-            # Normalize input
-            normalized_input = user_input.lower()
+            # Answer "first/last message" questions from the chronological index
+            chrono_answer = answer_chronological_query(memory_store, NAMESPACE, user_input)
+            if chrono_answer:
+                print(f"MemBot: {chrono_answer}")
+                conversation_history.append({"role": "user", "content": user_input})
+                conversation_history.append({"role": "assistant", "content": chrono_answer})
+                continue
 
             # Add user input to history
             conversation_history.append({"role": "user", "content": user_input})
 
-            # Invoke agent with thread config
-            response = agent.invoke({"messages": conversation_history}, config=config)
-
-            # Extract response
-            ai_response = (
-                response["messages"][-1].content
-                if isinstance(response, dict) and "messages" in response
-                else str(response)
-            )
+            # Route the turn: direct LLM call or agent with prefetched memories and the user profile
+            ai_response = generate_reply(conversation_history, config)
             print(f"MemBot: {ai_response}")
 
             # Add bot response to history
             conversation_history.append({"role": "assistant", "content": ai_response})
 
-            # Store in LangMem with config
-            memory_entry = f"User: {normalized_input} | Bot: {ai_response}"
-            agent.invoke(
-                {"messages": [{"role": "system", "content": f"Use manage_memory_tool to store: {memory_entry}"}]},
-                config=config  # Added here to fix the error
-            )
+            # Store as a structured memory record (no extra LLM call)
+            store_turn(user_input, ai_response, config["configurable"]["thread_id"])
 
             # Show stored memories
             # print_stored_memories()
@@ -0,0 +1,65 @@
+"""
+Retrieval prefetch for MemBot.
+- Starts a memory search as soon as the user message arrives, in parallel with prompt preparation.
+- Injects the top-k memories into the agent context so most turns finish in a single LLM call.
+- `search_memory_tool` stays bound to the agent for follow-up lookups.
+- Prefetch searches don't count as memory accesses; callers record the memories they inject with `store.record_access`.
+"""
+
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+# Prefetch settings
+PREFETCH_K = 3
+PREFETCH_TIMEOUT = 2.0  # Seconds to wait for the search before answering without it
+
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="memory-prefetch")
+
+def start_prefetch(store, namespace: tuple, query: str, k: int = PREFETCH_K) -> Future:
+    """Search memories for the query in a background thread and return the pending future."""
+    return _executor.submit(store.search, namespace, query=query, limit=k, count_access=False)
+
+def start_aprefetch(store, namespace: tuple, query: str, k: int = PREFETCH_K) -> asyncio.Task:
+    """Search memories for the query as a concurrent task on the running event loop."""
+    return asyncio.create_task(store.asearch(namespace, query=query, limit=k, count_access=False))
+
+def format_memories(items: list) -> str:
+    """Render prefetched memories as a system message body, or an empty string if there are none."""
+    lines = []
+    for item in items or []:
+        value = getattr(item, "value", None)
+        if isinstance(value, dict) and "content" in value:
+            value = value["content"]
+        if value:
+            lines.append(f"- {value}")
+    if not lines:
+        return ""
+    return "Relevant memories (prefetched, most similar first):\n" + "\n".join(lines)
+
+def with_memories(messages: list, items: list) -> list:
+    """Return a copy of messages with the prefetched memories inserted before the last user turn."""
+    context = format_memories(items)
+    if not context:
+        return list(messages)
+    return messages[:-1] + [{"role": "system", "content": context}] + messages[-1:]
+
+def collect_prefetch(future: Future, timeout: float = PREFETCH_TIMEOUT) -> list:
+    """Wait for a prefetch future, returning no memories if it fails or times out."""
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeoutError:
+        future.cancel()
+        print("Memory prefetch timed out; continuing without it.")
+    except Exception as e:
+        print(f"Memory prefetch failed: {e}")
+    return []
+
+async def acollect_prefetch(task: asyncio.Task, timeout: float = PREFETCH_TIMEOUT) -> list:
+    """Await a prefetch task, returning no memories if it fails or times out."""
+    try:
+        return await asyncio.wait_for(task, timeout=timeout)
+    except asyncio.TimeoutError:
+        print("Memory prefetch timed out; continuing without it.")
+    except Exception as e:
+        print(f"Memory prefetch failed: {e}")
+    return []
@@ -0,0 +1,152 @@
+"""
+Per-namespace memory accounting and quotas for MemBot.
+- Tracks entry count, value bytes and vector RAM bytes for every namespace (user).
+- Enforces configurable quotas with pluggable eviction policies, so one heavy user can't degrade everyone else.
+- Admin helpers list the top consumers.
+"""
+
+import json
+import sys
+from collections import defaultdict
+
+# Approximate RAM of one embedding dimension stored as a Python float inside a list
+FLOAT_BYTES = sys.getsizeof(1.0) + 8
+
+class QuotaExceededError(Exception):
+    """Raised when a namespace is over quota and its eviction policy refuses to make room."""
+
+class Quota:
+    """Limits for one namespace; None means unlimited."""
+
+    def __init__(self, max_entries: int | None = None, max_bytes: int | None = None,
+                 max_vector_bytes: int | None = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_vector_bytes = max_vector_bytes
+
+    def exceeded_by(self, usage: "NamespaceUsage") -> bool:
+        """Return True if the usage is above any of the limits."""
+        return (
+            (self.max_entries is not None and usage.entries > self.max_entries)
+            or (self.max_bytes is not None and usage.bytes > self.max_bytes)
+            or (self.max_vector_bytes is not None and usage.vector_bytes > self.max_vector_bytes)
+        )
+
+class NamespaceUsage:
+    """Running totals for one namespace."""
+
+    __slots__ = ("entries", "bytes", "vector_bytes")
+
+    def __init__(self):
+        self.entries = 0
+        self.bytes = 0
+        self.vector_bytes = 0
+
+    def as_dict(self) -> dict:
+        return {"entries": self.entries, "bytes": self.bytes, "vector_bytes": self.vector_bytes}
+
+# Eviction policies: (store, namespace, protected_key) -> key to evict, or None to refuse
+def evict_oldest(store, namespace: tuple, protected_key: str | None = None) -> str | None:
+    """Evict the oldest memory in the namespace."""
+    for key in store.chrono.first(namespace, 2):
+        if key != protected_key:
+            return key
+    return None
+
+def evict_least_used(store, namespace: tuple, protected_key: str | None = None) -> str | None:
+    """Evict the memory search returned least often, oldest first among ties."""
+    hits = store._access[namespace]
+    victim, victim_hits = None, None
+    for key in store.chrono.first(namespace, store.chrono.count(namespace)):
+        if key == protected_key:
+            continue
+        if victim is None or hits.get(key, 0) < victim_hits:
+            victim, victim_hits = key, hits.get(key, 0)
+            if victim_hits == 0:
+                break
+    return victim
+
+def evict_none(store, namespace: tuple, protected_key: str | None = None) -> str | None:
+    """Never evict; writes over quota are rejected with QuotaExceededError."""
+    return None
+
+EVICTION_POLICIES = {
+    "oldest": evict_oldest,
+    "least_used": evict_least_used,
+    "reject": evict_none,
+}
+
+class QuotaManager:
+    """Accounts memory usage per namespace and decides what to evict when a quota is exceeded."""
+
+    def __init__(self, default_quota: Quota | None = None, eviction="oldest"):
+        self.default_quota = default_quota or Quota()
+        self.eviction = EVICTION_POLICIES[eviction] if isinstance(eviction, str) else eviction
+        self._quotas = {}
+        self._policies = {}
+        self._usage = defaultdict(NamespaceUsage)
+        self._sizes = defaultdict(dict)  # [ns][key] -> (bytes, vector_bytes)
+
+    def set_quota(self, namespace: tuple, quota: Quota, eviction=None) -> None:
+        """Override the quota (and optionally the eviction policy) for one namespace."""
+        self._quotas[namespace] = quota
+        if eviction is not None:
+            self._policies[namespace] = EVICTION_POLICIES[eviction] if isinstance(eviction, str) else eviction
+
+    def quota_for(self, namespace: tuple) -> Quota:
+        return self._quotas.get(namespace, self.default_quota)
+
+    def policy_for(self, namespace: tuple):
+        return self._policies.get(namespace, self.eviction)
+
+    def record_put(self, namespace: tuple, key: str, value: dict, vectors: dict | None) -> None:
+        """Account for a new or replaced memory."""
+        self.record_delete(namespace, key)
+        value_bytes = len(json.dumps(value, default=str).encode("utf-8"))
+        vector_bytes = sum(
+            sys.getsizeof(vector) + len(vector) * FLOAT_BYTES for vector in (vectors or {}).values()
+        )
+        usage = self._usage[namespace]
+        usage.entries += 1
+        usage.bytes += value_bytes
+        usage.vector_bytes += vector_bytes
+        self._sizes[namespace][key] = (value_bytes, vector_bytes)
+
+    def record_delete(self, namespace: tuple, key: str) -> None:
+        """Release the accounting for a removed memory."""
+        sizes = self._sizes[namespace].pop(key, None)
+        if sizes is None:
+            return
+        usage = self._usage[namespace]
+        usage.entries -= 1
+        usage.bytes -= sizes[0]
+        usage.vector_bytes -= sizes[1]
+
+    def is_over(self, namespace: tuple) -> bool:
+        return self.quota_for(namespace).exceeded_by(self._usage[namespace])
+
+    def usage(self, namespace: tuple) -> dict:
+        """Return entry count, value bytes and vector bytes for a namespace."""
+        return self._usage[namespace].as_dict()
+
+    # Admin API
+
+    def top_consumers(self, n: int = 10, by: str = "bytes") -> list:
+        """Return the n namespaces using the most `entries`, `bytes` or `vector_bytes`."""
+        ranked = sorted(self._usage.items(), key=lambda x: getattr(x[1], by), reverse=True)
+        return [(namespace, usage.as_dict()) for namespace, usage in ranked[:n] if usage.entries]
+
+    def print_top_consumers(self, n: int = 10, by: str = "bytes") -> None:
+        """Print the top consumers as a small table."""
+        print(f"\n--- Top {n} Memory Consumers (by {by}) ---")
+        consumers = self.top_consumers(n, by)
+        if not consumers:
+            print("No memories stored yet.")
+        for namespace, usage in consumers:
+            quota = self.quota_for(namespace)
+            print(
+                f"{'/'.join(namespace)}: {usage['entries']} entries (max {quota.max_entries}), "
+                f"{usage['bytes']} B (max {quota.max_bytes}), "
+                f"{usage['vector_bytes']} vector B (max {quota.max_vector_bytes})"
+            )
+        print("----------------------\n")
@@ -0,0 +1,56 @@
+"""
+Recency-aware ranking for MemBot memory search.
+- Combines vector similarity with an exponential recency decay and access frequency.
+- Used by IndexedInMemoryStore to re-rank an oversampled similarity shortlist.
+"""
+
+import math
+from datetime import datetime, timezone
+
+from langgraph.store.base import SearchItem
+
+# Ranking weights (similarity dominates; recency and frequency break near-ties)
+SIMILARITY_WEIGHT = 0.7
+RECENCY_WEIGHT = 0.2
+FREQUENCY_WEIGHT = 0.1
+RECENCY_HALF_LIFE_HOURS = 72.0
+
+def created_at_of(item) -> datetime:
+    """Return the original creation time of a memory, preferring the stamped value."""
+    stamped = item.value.get("created_at") if isinstance(item.value, dict) else None
+    return datetime.fromisoformat(stamped) if stamped else item.created_at
+
+def recency_score(created_at: datetime, now: datetime, half_life_hours: float = RECENCY_HALF_LIFE_HOURS) -> float:
+    """Exponential decay: 1.0 for a brand-new memory, 0.5 after one half-life."""
+    age_hours = max((now - created_at).total_seconds(), 0.0) / 3600
+    return 0.5 ** (age_hours / half_life_hours)
+
+def frequency_score(hits: int, max_hits: int) -> float:
+    """Log-scaled access count normalised to [0, 1] against the most accessed candidate."""
+    if max_hits <= 0:
+        return 0.0
+    return math.log1p(hits) / math.log1p(max_hits)
+
+def rank_items(items: list, hits: dict, now: datetime | None = None,
+               half_life_hours: float = RECENCY_HALF_LIFE_HOURS) -> list:
+    """Re-rank search results by combined score; `hits` maps key -> access count."""
+    now = now or datetime.now(timezone.utc)
+    max_hits = max((hits.get(item.key, 0) for item in items), default=0)
+    ranked = []
+    for item in items:
+        similarity = item.score if item.score is not None else 0.0
+        score = (
+            SIMILARITY_WEIGHT * similarity
+            + RECENCY_WEIGHT * recency_score(created_at_of(item), now, half_life_hours)
+            + FREQUENCY_WEIGHT * frequency_score(hits.get(item.key, 0), max_hits)
+        )
+        ranked.append(SearchItem(
+            namespace=item.namespace,
+            key=item.key,
+            value=item.value,
+            created_at=item.created_at,
+            updated_at=item.updated_at,
+            score=score,
+        ))
+    ranked.sort(key=lambda x: x.score, reverse=True)
+    return ranked
@@ -0,0 +1,238 @@
+"""
+Log-based replication of MemBot memory stores to read replicas.
+- The primary IndexedInMemoryStore appends every memory put and delete (stamped value plus embedding vectors)
+  to an append-only JSONL change log.
+- Replicas tail the log from their last applied byte offset and apply changes to their local store without re-embedding.
+- Two transports: reading the shared log file directly, or a TCP socket served by `serve`.
+- Replicas are eventually consistent. Their stores live in memory, so a (re)started replica replays the log from offset 0.
+
+Usage:
+    python memory_replication.py serve --log memory_changes.jsonl --port 8765
+    python memory_replication.py tail tcp://127.0.0.1:8765
+"""
+
+import argparse
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+
+# Replication settings
+CHANGE_LOG_PATH = "memory_changes.jsonl"
+REPLICATION_PORT = 8765
+POLL_INTERVAL = 0.5  # Seconds a caught-up replica waits before checking for new changes
+FETCH_LIMIT = 1000  # Change log entries fetched and applied per poll
+
+class ChangeLog:
+    """Append-only JSONL log of memory puts and deletes, written by the primary store."""
+
+    def __init__(self, path: str = CHANGE_LOG_PATH):
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def append(self, op: str, namespace: tuple, key: str, value: dict | None = None,
+               vectors: dict | None = None) -> None:
+        """Append one change; a put carries the stamped value and its vectors by field path."""
+        entry = {"op": op, "namespace": list(namespace), "key": key, "ts": time.time()}
+        if op == "put":
+            entry["value"] = value
+            entry["vectors"] = {path: [float(x) for x in vector] for path, vector in (vectors or {}).items()}
+        line = json.dumps(entry, default=str) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+def read_log_lines(path: str, offset: int, limit: int = FETCH_LIMIT) -> tuple:
+    """Return up to `limit` complete raw lines after byte `offset`, and the offset just past them."""
+    if not os.path.exists(path):
+        return [], offset
+    lines = []
+    with open(path, "rb") as f:
+        f.seek(offset)
+        while len(lines) < limit:
+            line = f.readline()
+            if not line.endswith(b"\n"):
+                break  # End of log, or a line still being written; picked up on the next poll
+            lines.append(line)
+            offset += len(line)
+    return lines, offset
+
+class FileSource:
+    """Reads changes straight from a change log file (same host or shared volume)."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def fetch(self, offset: int) -> tuple:
+        lines, offset = read_log_lines(self.path, offset)
+        return [json.loads(line) for line in lines], offset
+
+    def close(self) -> None:
+        pass
+
+class SocketSource:
+    """Fetches changes from a `serve` process over TCP, reconnecting after errors."""
+
+    def __init__(self, host: str, port: int = REPLICATION_PORT, timeout: float = 10.0):
+        self.address = (host, port)
+        self.timeout = timeout
+        self._sock = None
+        self._reader = None
+
+    def fetch(self, offset: int) -> tuple:
+        try:
+            if self._sock is None:
+                self._sock = socket.create_connection(self.address, timeout=self.timeout)
+                self._reader = self._sock.makefile("rb")
+            self._sock.sendall(f"{offset}\n".encode())
+            entries = []
+            for line in iter(self._reader.readline, b"\n"):
+                if not line:
+                    raise ConnectionError("replication server closed the connection")
+                entries.append(json.loads(line))
+                offset += len(line)
+            return entries, offset
+        except (OSError, ValueError):
+            self.close()
+            raise
+
+    def close(self) -> None:
+        if self._sock is not None:
+            self._reader.close()
+            self._sock.close()
+        self._sock = self._reader = None
+
+def open_source(spec: str):
+    """Return a SocketSource for "tcp://host:port", otherwise a FileSource for the given path."""
+    if spec.startswith("tcp://"):
+        host, _, port = spec[len("tcp://"):].rpartition(":")
+        return SocketSource(host, int(port))
+    return FileSource(spec)
+
+class _LogRequestHandler(socketserver.StreamRequestHandler):
+    """Each request is a byte offset; the reply is the lines after it followed by an empty line."""
+
+    def handle(self):
+        for request in self.rfile:
+            lines, _ = read_log_lines(self.server.log_path, int(request))
+            self.wfile.write(b"".join(lines) + b"\n")
+
+class ChangeLogServer(socketserver.ThreadingTCPServer):
+    """Serves a change log file to replicas over TCP."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, log_path: str, host: str = "127.0.0.1", port: int = REPLICATION_PORT):
+        self.log_path = log_path
+        super().__init__((host, port), _LogRequestHandler)
+
+def serve(log_path: str = CHANGE_LOG_PATH, host: str = "127.0.0.1", port: int = REPLICATION_PORT) -> None:
+    with ChangeLogServer(log_path, host, port) as server:
+        print(f"Serving change log {log_path} on {host}:{port}")
+        server.serve_forever()
+
+def apply_change(store, entry: dict) -> None:
+    """Apply one change log entry to a local IndexedInMemoryStore, reusing the primary's vectors."""
+    namespace = tuple(entry["namespace"])
+    if entry["op"] == "put":
+        store.bulk_load([(namespace, entry["key"], entry["value"], entry.get("vectors") or None)])
+    elif entry["op"] == "delete":
+        store.bulk_delete([(namespace, entry["key"])])
+
+class ReplicaApplier:
+    """Tails a change log source and applies it to a local store on a background thread."""
+
+    def __init__(self, store, source, poll_interval: float = POLL_INTERVAL):
+        self.store = store
+        self.source = source
+        self.poll_interval = poll_interval
+        # The offset lives only as long as the in-memory store it describes; never resume a new store mid-log
+        self.offset = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def poll_once(self) -> int:
+        """Fetch and apply the next chunk of changes; returns how many were applied."""
+        entries, offset = self.source.fetch(self.offset)
+        for entry in entries:
+            apply_change(self.store, entry)
+        self.offset = offset
+        return len(entries)
+
+    def catch_up(self) -> int:
+        """Apply changes until the replica has reached the end of the log."""
+        total = 0
+        while applied := self.poll_once():
+            total += applied
+        return total
+
+    def start(self) -> None:
+        """Start tailing on a daemon thread."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="replica-applier", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.source.close()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                applied = self.poll_once()
+            except (OSError, ValueError) as e:
+                print(f"Error applying replicated changes: {e}")
+                applied = 0
+            if applied < FETCH_LIMIT:
+                self._stop.wait(self.poll_interval)
+
+def start_replica(store, spec: str) -> ReplicaApplier:
+    """Replay a primary's change log (path or tcp://host:port) into a local store, then keep tailing it."""
+    applier = ReplicaApplier(store, open_source(spec))
+    applier.catch_up()
+    applier.start()
+    return applier
+
+def main():
+    """Serve a change log over TCP, or tail one into a local store and report what was applied."""
+    parser = argparse.ArgumentParser(description="Replicate MemBot memories through a change log.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    serve_parser = subparsers.add_parser("serve", help="Serve a change log file to replicas over TCP")
+    serve_parser.add_argument("--log", default=CHANGE_LOG_PATH, help="Change log file written by the primary")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=REPLICATION_PORT)
+    tail_parser = subparsers.add_parser("tail", help="Apply a change log to an in-memory replica")
+    tail_parser.add_argument("source", help="Change log path or tcp://host:port")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args.log, args.host, args.port)
+        return
+
+    from indexed_store import IndexedInMemoryStore
+
+    store = IndexedInMemoryStore(read_only=True)
+    applier = ReplicaApplier(store, open_source(args.source))
+    try:
+        while True:
+            applied = applier.catch_up()
+            if applied:
+                counts = {"/".join(ns): store.chrono.count(ns) for ns in list(store._data)}
+                print(f"Applied {applied} changes (offset {applier.offset}): {counts}")
+            time.sleep(POLL_INTERVAL)
+    except KeyboardInterrupt:
+        applier.source.close()
+
+if __name__ == "__main__":
+    main()
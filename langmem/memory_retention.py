@@ -0,0 +1,212 @@
+"""
+Retention policies and background compaction for membot_memories.db.
+- Per-namespace retention: per-row TTL (fixed when a row is written or first swept), max-age and max-count (applied on every sweep).
+- A background sweeper deletes expired memories, old history snapshots and orphaned vectors in small batches,
+  so chat writes never wait behind one long transaction.
+- Periodic incremental vacuum returns freed pages to the OS and reports the reclaimed bytes.
+"""
+
+import sqlite3
+import threading
+import time
+
+# Retention settings
+SWEEP_INTERVAL = 300.0  # Seconds between sweeps
+DELETE_BATCH_SIZE = 500  # Rows deleted per short transaction
+BATCH_PAUSE = 0.05  # Seconds yielded to chat writers between batches
+VACUUM_PAGES = 1000  # Free pages returned per incremental vacuum step
+HISTORY_KEEP = 20  # Conversation history snapshots kept (only the latest is ever loaded)
+
+class RetentionPolicy:
+    """Retention limits for one namespace; None means unlimited."""
+
+    def __init__(self, ttl_seconds: float | None = None, max_age_seconds: float | None = None,
+                 max_count: int | None = None):
+        self.ttl_seconds = ttl_seconds  # Stamped into expires_at on write (insert_memory) or by the next sweep
+        self.max_age_seconds = max_age_seconds  # Evaluated on every sweep, so it also applies to old rows
+        self.max_count = max_count  # Newest memories kept per namespace
+
+def connect(db_path: str) -> sqlite3.Connection:
+    """Open a connection tuned for a chat writer and a background sweeper sharing the file."""
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+def ensure_retention_schema(db_path: str) -> None:
+    """Add timestamp columns and switch the database to incremental auto-vacuum (one-time migration)."""
+    conn = connect(db_path)
+    try:
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(memories)")}
+        if "created_at" not in columns:
+            conn.execute("ALTER TABLE memories ADD COLUMN created_at REAL")
+        if "expires_at" not in columns:
+            conn.execute("ALTER TABLE memories ADD COLUMN expires_at REAL")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_memories_ns_created ON memories (namespace, created_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_memories_expires ON memories (expires_at) WHERE expires_at IS NOT NULL")
+        conn.commit()
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            # Only takes effect after a full VACUUM; every later compaction is incremental
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+def insert_memory(conn: sqlite3.Connection, key: str, namespace: str, value: str,
+                  policy: RetentionPolicy | None = None) -> None:
+    """Insert a memory row with its creation time and, if the policy has a TTL, its expiry."""
+    now = time.time()
+    expires_at = now + policy.ttl_seconds if policy and policy.ttl_seconds else None
+    conn.execute(
+        "INSERT OR IGNORE INTO memories (id, namespace, value, created_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+        (key, namespace, value, now, expires_at),
+    )
+
+def database_bytes(conn: sqlite3.Connection) -> int:
+    """Size of the main database file in bytes (free pages included)."""
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    return conn.execute("PRAGMA page_count").fetchone()[0] * page_size
+
+class RetentionSweeper:
+    """Enforces retention policies and compacts the database on a background thread."""
+
+    def __init__(self, db_path: str, default_policy: RetentionPolicy | None = None,
+                 policies: dict | None = None, interval: float = SWEEP_INTERVAL):
+        self.db_path = db_path
+        self.default_policy = default_policy or RetentionPolicy()
+        self.policies = dict(policies or {})
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def policy_for(self, namespace: str) -> RetentionPolicy:
+        return self.policies.get(namespace, self.default_policy)
+
+    def start(self) -> None:
+        """Start sweeping every `interval` seconds on a daemon thread."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="retention-sweeper", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                stats = self.sweep_once()
+                if stats["deleted"] or stats["reclaimed_bytes"]:
+                    print(
+                        f"\n--- Retention sweep: deleted {stats['deleted']} memories, "
+                        f"{stats['history_deleted']} history snapshots, reclaimed {stats['reclaimed_bytes']} bytes ---"
+                    )
+            except sqlite3.Error as e:
+                print(f"Error during retention sweep: {e}")
+
+    def sweep_once(self) -> dict:
+        """Run one full sweep and compaction pass; returns counts and reclaimed bytes."""
+        conn = connect(self.db_path)
+        try:
+            now = time.time()
+            self._stamp_legacy_rows(conn, now)
+            namespaces = [row[0] for row in conn.execute("SELECT DISTINCT namespace FROM memories")]
+            for namespace in namespaces:
+                self._stamp_ttl(conn, namespace, self.policy_for(namespace))
+            deleted = self._delete_batched(
+                conn, "memories", "expires_at IS NOT NULL AND expires_at <= ?", (now,)
+            )
+            for namespace in namespaces:
+                policy = self.policy_for(namespace)
+                if policy.max_age_seconds is not None:
+                    deleted += self._delete_batched(
+                        conn, "memories", "namespace = ? AND created_at < ?",
+                        (namespace, now - policy.max_age_seconds),
+                    )
+                if policy.max_count is not None:
+                    deleted += self._delete_batched(
+                        conn, "memories",
+                        "namespace = ? AND rowid NOT IN (SELECT rowid FROM memories WHERE namespace = ? "
+                        "ORDER BY created_at DESC, rowid DESC LIMIT ?)",
+                        (namespace, namespace, policy.max_count),
+                    )
+            history_deleted = 0
+            if self._has_table(conn, "history"):  # Absent in databases created only by batch_ingest.py
+                history_deleted = self._delete_batched(
+                    conn, "history", "id NOT IN (SELECT id FROM history ORDER BY id DESC LIMIT ?)", (HISTORY_KEEP,)
+                )
+            if self._has_table(conn, "memory_vectors"):
+                self._delete_batched(
+                    conn, "memory_vectors", "id NOT IN (SELECT id FROM memories)", ()
+                )
+            return {
+                "deleted": deleted,
+                "history_deleted": history_deleted,
+                "reclaimed_bytes": self._incremental_vacuum(conn),
+            }
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _has_table(conn: sqlite3.Connection, name: str) -> bool:
+        return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone() is not None
+
+    def _stamp_legacy_rows(self, conn: sqlite3.Connection, now: float) -> None:
+        """Rows written before the migration get their first-seen time, so max-age can apply to them."""
+        while not self._stop.is_set():
+            with conn:
+                cursor = conn.execute(
+                    "UPDATE memories SET created_at = ? WHERE rowid IN "
+                    "(SELECT rowid FROM memories WHERE created_at IS NULL LIMIT ?)",
+                    (now, DELETE_BATCH_SIZE),
+                )
+            if cursor.rowcount < DELETE_BATCH_SIZE:
+                break
+            time.sleep(BATCH_PAUSE)
+
+    def _stamp_ttl(self, conn: sqlite3.Connection, namespace: str, policy: RetentionPolicy) -> None:
+        """Give rows written without an expiry (e.g. under another policy) their namespace's TTL."""
+        if policy.ttl_seconds is None:
+            return
+        while not self._stop.is_set():
+            with conn:
+                cursor = conn.execute(
+                    "UPDATE memories SET expires_at = created_at + ? WHERE rowid IN "
+                    "(SELECT rowid FROM memories WHERE namespace = ? AND expires_at IS NULL LIMIT ?)",
+                    (policy.ttl_seconds, namespace, DELETE_BATCH_SIZE),
+                )
+            if cursor.rowcount < DELETE_BATCH_SIZE:
+                break
+            time.sleep(BATCH_PAUSE)
+
+    def _delete_batched(self, conn: sqlite3.Connection, table: str, where: str, params: tuple) -> int:
+        """Delete matching rows in short transactions, pausing between batches for chat writers."""
+        total = 0
+        while not self._stop.is_set():
+            with conn:
+                cursor = conn.execute(
+                    f"DELETE FROM {table} WHERE rowid IN (SELECT rowid FROM {table} WHERE {where} LIMIT ?)",
+                    params + (DELETE_BATCH_SIZE,),
+                )
+            total += cursor.rowcount
+            if cursor.rowcount < DELETE_BATCH_SIZE:
+                break
+            time.sleep(BATCH_PAUSE)
+        return total
+
+    def _incremental_vacuum(self, conn: sqlite3.Connection) -> int:
+        """Release free pages a chunk at a time instead of one blocking VACUUM; returns the bytes released."""
+        before = database_bytes(conn)
+        free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        while free_pages and not self._stop.is_set():
+            conn.execute(f"PRAGMA incremental_vacuum({VACUUM_PAGES})").fetchall()
+            conn.commit()
+            remaining = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if remaining >= free_pages:
+                break  # auto_vacuum is not INCREMENTAL; run ensure_retention_schema first
+            free_pages = remaining
+            time.sleep(BATCH_PAUSE)
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return max(before - database_bytes(conn), 0)
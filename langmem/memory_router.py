@@ -0,0 +1,92 @@
+"""
+Fast-path router for MemBot.
+- Sends memory-free turns (greetings, thanks, general questions) to a single direct LLM call.
+- Sends memory-relevant turns to the tool-enabled ReAct agent.
+- Keyword rules first, then embedding similarity to prototype utterances using the existing MiniLM embedder.
+- Every decision is logged to logs/router.log with running totals of agent calls saved.
+"""
+
+import re
+from collections import Counter
+
+import numpy as np
+
+from logger_config import configure_logging
+
+# Router settings
+ROUTER_MARGIN = 0.05  # A turn goes direct only if it is this much closer to small talk than to memory use
+
+MEMORY_KEYWORDS = re.compile(
+    r"\b(remember|recall|remind|forget|forgot|earlier|before|last time|previously|told you|i said|"
+    r"i mentioned|did i|have i|my name|about me|my favou?rite|know about me|we talked|we discussed|"
+    r"first message|last message|last question)\b",
+    re.IGNORECASE,
+)
+
+MEMORY_PROTOTYPES = [
+    "what did I tell you earlier",
+    "do you remember what I said",
+    "what is my name",
+    "what do you know about me",
+    "what was my last question",
+    "remind me what we talked about",
+    "please remember that I like python",
+    "what are my favourite things",
+]
+
+DIRECT_PROTOTYPES = [
+    "hi",
+    "hello there",
+    "thanks a lot",
+    "thank you",
+    "good morning",
+    "how are you",
+    "ok cool",
+    "bye",
+    "tell me a joke",
+    "what is the capital of France",
+    "explain how a for loop works",
+    "what is 2 plus 2",
+]
+
+class MemoryRouter:
+    """Classifies a user turn as "memory" (tool-enabled agent) or "direct" (single LLM call)."""
+
+    def __init__(self, embed_text, margin: float = ROUTER_MARGIN, log_filename: str = "router.log"):
+        self.embed_text = embed_text
+        self.margin = margin
+        self.logger = configure_logging("logs", log_filename)
+        self.counts = Counter()
+        self._memory_vectors = self._embed_all(MEMORY_PROTOTYPES)
+        self._direct_vectors = self._embed_all(DIRECT_PROTOTYPES)
+
+    def _embed_all(self, texts: list) -> np.ndarray:
+        vectors = np.array([self.embed_text(text) for text in texts], dtype=np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def _classify(self, text: str) -> tuple:
+        """Return (route, reason, memory_similarity, direct_similarity)."""
+        if MEMORY_KEYWORDS.search(text):
+            return "memory", "keyword", None, None
+        try:
+            vector = np.asarray(self.embed_text(text), dtype=np.float32)
+            vector /= np.linalg.norm(vector) or 1.0
+        except Exception as e:
+            self.logger.warning(f"Router embedding failed, using agent: {e}")
+            return "memory", "embed_error", None, None
+        memory_sim = float(np.max(self._memory_vectors @ vector))
+        direct_sim = float(np.max(self._direct_vectors @ vector))
+        if direct_sim - memory_sim > self.margin:
+            return "direct", "similarity", memory_sim, direct_sim
+        return "memory", "similarity", memory_sim, direct_sim
+
+    def route(self, text: str) -> str:
+        """Classify a turn, log the decision and return "memory" or "direct"."""
+        route, reason, memory_sim, direct_sim = self._classify(text)
+        self.counts[route] += 1
+        scores = f" memory_sim={memory_sim:.3f} direct_sim={direct_sim:.3f}" if memory_sim is not None else ""
+        self.logger.info(
+            f"route={route} reason={reason}{scores} "
+            f"agent_calls_saved={self.counts['direct']}/{sum(self.counts.values())} text={text[:80]!r}"
+        )
+        return route
@@ -0,0 +1,87 @@
+"""
+Local mock of the Azure OpenAI chat completions endpoint for exercising azure_openai_llm.py.
+- Answers every chat completion with a short canned reply and a `usage` block.
+- Can inject latency and a share of 429 responses with retry-after headers.
+
+Usage:
+    python mock_azure_server.py --port 8089 --rate-429 0.2 --latency 0.1
+    # then in .env: AZURE_ENDPOINT=http://127.0.0.1:8089  AZURE_OPEN_AI_API_KEY=test  API_VERSION=2024-06-01  AZURE_MODEL=mock
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class MockAzureHandler(BaseHTTPRequestHandler):
+    """Serves POST /openai/deployments/<model>/chat/completions."""
+
+    protocol_version = "HTTP/1.1"  # Keep-alive, so connection pooling is observable
+    rate_429 = 0.0
+    latency = 0.0
+    requests_seen = 0
+    counter_lock = threading.Lock()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with self.counter_lock:
+            type(self).requests_seen += 1
+        time.sleep(self.latency)
+
+        if random.random() < self.rate_429:
+            self._reply(429, {"error": {"code": "429", "message": "Rate limit is exceeded."}}, {"retry-after-ms": "200"})
+            return
+
+        payload = json.loads(body or b"{}")
+        last = (payload.get("messages") or [{}])[-1].get("content", "")
+        prompt_tokens = len(body) // 4
+        self._reply(200, {
+            "id": f"chatcmpl-mock-{self.requests_seen}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": "mock",
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": f"Mock reply to: {str(last)[:80]}"},
+            }],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": 10, "total_tokens": prompt_tokens + 10},
+        })
+
+    def _reply(self, status: int, payload: dict, headers: dict | None = None) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        print(f"[mock-azure] {self.address_string()} {format % args}")
+
+def serve(port: int = 8089, rate_429: float = 0.0, latency: float = 0.0) -> ThreadingHTTPServer:
+    """Start the mock server on a background thread and return it (call .shutdown() to stop)."""
+    MockAzureHandler.rate_429 = rate_429
+    MockAzureHandler.latency = latency
+    server = ThreadingHTTPServer(("127.0.0.1", port), MockAzureHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock Azure OpenAI chat completions server.")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Share of requests answered with 429")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds of delay per request")
+    args = parser.parse_args()
+
+    MockAzureHandler.rate_429 = args.rate_429
+    MockAzureHandler.latency = args.latency
+    print(f"Mock Azure OpenAI listening on http://127.0.0.1:{args.port}")
+    ThreadingHTTPServer(("127.0.0.1", args.port), MockAzureHandler).serve_forever()
+
+if __name__ == "__main__":
+    main()
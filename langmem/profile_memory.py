@@ -0,0 +1,143 @@
+"""
+Compact per-user profile memory for MemBot.
+- Keeps one structured UserProfile document of stable user facts per namespace, next to the episodic memories.
+- Updated incrementally in the background with LangMem's `create_memory_manager`, using only the newest turns.
+- Read with a single store.get on every turn, so personalization needs no memory search.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from langmem import create_memory_manager
+from pydantic import BaseModel, Field
+
+# Profile settings
+PROFILE_KEY = "profile"
+PROFILE_UPDATE_EVERY = 3  # Turns batched into one background profile update
+
+PROFILE_INSTRUCTIONS = """
+You maintain a single compact profile of the user. Record only stable facts the user states about themselves
+(name, location, occupation, interests, preferences, goals). Ignore small talk and one-off requests.
+Update the existing profile in place; keep lists short and drop facts the user contradicts.
+"""
+
+class UserProfile(BaseModel):
+    """Stable facts about the user. Update the existing profile rather than creating a new one."""
+
+    name: str | None = Field(default=None, description="The user's name or preferred name.")
+    location: str | None = Field(default=None, description="Where the user lives or works.")
+    occupation: str | None = Field(default=None, description="The user's job or main activity.")
+    interests: list[str] = Field(default_factory=list, description="Topics or hobbies the user cares about.")
+    preferences: list[str] = Field(default_factory=list, description="How the user likes things done.")
+    goals: list[str] = Field(default_factory=list, description="What the user is trying to achieve.")
+    other_facts: list[str] = Field(default_factory=list, description="Other durable facts about the user.")
+
+def merge_profiles(profiles: list) -> UserProfile:
+    """Fold several extracted profiles into one: later single values win, list facts are unioned."""
+    merged = {}
+    for profile in profiles:
+        for field, value in profile.model_dump().items():
+            if isinstance(value, list):
+                merged[field] = list(dict.fromkeys(merged.get(field, []) + value))
+            elif value is not None:
+                merged[field] = value
+    return UserProfile(**merged)
+
+def profile_namespace(namespace: tuple) -> tuple:
+    """Profiles live beside, not under, the episodic namespace so memory search never returns them."""
+    return ("profiles",) + tuple(namespace)
+
+def get_profile(store, namespace: tuple) -> dict | None:
+    """Return the user's profile document in O(1), or None if nothing is known yet."""
+    item = store.get(profile_namespace(namespace), PROFILE_KEY)
+    return item.value.get("content") if item else None
+
+def format_profile(profile: dict | None) -> str:
+    """Render a profile as a system message body, or an empty string if it has no facts."""
+    if not profile:
+        return ""
+    lines = []
+    for field, value in profile.items():
+        if value:
+            label = field.replace("_", " ").capitalize()
+            lines.append(f"- {label}: {', '.join(value) if isinstance(value, list) else value}")
+    if not lines:
+        return ""
+    return "Known facts about the user (profile):\n" + "\n".join(lines)
+
+def with_profile(messages: list, profile: dict | None) -> list:
+    """Return a copy of messages with the profile inserted before the last user turn."""
+    context = format_profile(profile)
+    if not context:
+        return list(messages)
+    return messages[:-1] + [{"role": "system", "content": context}] + messages[-1:]
+
+class ProfileUpdater:
+    """Batches recent turns and folds them into the stored profile in the background."""
+
+    def __init__(self, llm, store, namespace: tuple, update_every: int = PROFILE_UPDATE_EVERY):
+        # Inserts only until a profile exists; afterwards the model can only patch that one document
+        self.creator = create_memory_manager(
+            llm, schemas=[UserProfile], instructions=PROFILE_INSTRUCTIONS, enable_deletes=False
+        )
+        self.updater = create_memory_manager(
+            llm, schemas=[UserProfile], instructions=PROFILE_INSTRUCTIONS, enable_inserts=False, enable_deletes=False
+        )
+        self.store = store
+        self.namespace = namespace
+        self.update_every = update_every
+        self._pending = []
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="profile-updater")
+
+    def add_turn(self, user_input: str, ai_response: str) -> None:
+        """Queue one exchange; every `update_every` turns, update the profile on a background thread."""
+        messages = self._queue(user_input, ai_response)
+        if messages:
+            self._executor.submit(self._update, messages)
+
+    async def aadd_turn(self, user_input: str, ai_response: str) -> None:
+        """Async variant of add_turn: the update runs as a task on the running event loop."""
+        messages = self._queue(user_input, ai_response)
+        if messages:
+            asyncio.create_task(self._aupdate(messages))
+
+    def _queue(self, user_input: str, ai_response: str) -> list:
+        self._pending += [{"role": "user", "content": user_input}, {"role": "assistant", "content": ai_response}]
+        if len(self._pending) < 2 * self.update_every:
+            return []
+        messages, self._pending = self._pending, []
+        return messages
+
+    def _payload(self, messages: list) -> dict:
+        existing = get_profile(self.store, self.namespace)
+        payload = {"messages": messages}
+        if existing:
+            payload["existing"] = [(PROFILE_KEY, "UserProfile", existing)]
+        return payload
+
+    def _manager_for(self, payload: dict):
+        return self.updater if "existing" in payload else self.creator
+
+    def _save(self, extracted: list) -> None:
+        # The patched profile replaces the stored one; several new profiles are merged, never last-one-wins
+        current = [memory.content for memory in extracted if memory.id == PROFILE_KEY]
+        profiles = [p for p in current or [memory.content for memory in extracted] if isinstance(p, UserProfile)]
+        if profiles:
+            self.store.put(
+                profile_namespace(self.namespace), PROFILE_KEY,
+                {"content": merge_profiles(profiles).model_dump()}, index=False,
+            )
+
+    def _update(self, messages: list) -> None:
+        try:
+            payload = self._payload(messages)
+            self._save(self._manager_for(payload).invoke(payload))
+        except Exception as e:
+            print(f"Error updating profile: {e}")
+
+    async def _aupdate(self, messages: list) -> None:
+        try:
+            payload = self._payload(messages)
+            self._save(await self._manager_for(payload).ainvoke(payload))
+        except Exception as e:
+            print(f"Error updating profile: {e}")
@@ -1,5 +1,6 @@
 import streamlit as st
-from inmemory_membot import agent, SYSTEM_PROMPT
+from inmemory_membot import memory_store, generate_reply, store_turn, NAMESPACE, SYSTEM_PROMPT
+from indexed_store import LIST_PAGE_SIZE, answer_chronological_query, memory_content
 
 # Custom CSS for left (bot) and right (user) alignment
 st.markdown("""
@@ -64,22 +65,54 @@ def chat_with_membot():
         st.session_state.conversation_history.append({"role": "user", "content": user_input})
         with chat_container:
             st.markdown(f'<div class="user-message-container"><div class="user-message">{user_input}</div></div>', unsafe_allow_html=True)
+
+        # Answer "first/last message" questions from the chronological index
+        chrono_answer = answer_chronological_query(memory_store, NAMESPACE, user_input)
+        if chrono_answer:
+            st.session_state.conversation_history.append({"role": "assistant", "content": chrono_answer})
+            with chat_container:
+                st.markdown(f'<div class="bot-message-container"><div class="bot-message">{chrono_answer}</div></div>', unsafe_allow_html=True)
+            return
         
-        # Process bot response separately
-        response = agent.invoke({"messages": st.session_state.conversation_history}, config=config)
-        ai_response = response["messages"][-1].content if isinstance(response, dict) else str(response)
+        # Process bot response separately (direct LLM call or agent with prefetched memories)
+        ai_response = generate_reply(st.session_state.conversation_history, config)
         
         # Add assistant response to history and display it
         st.session_state.conversation_history.append({"role": "assistant", "content": ai_response})
         with chat_container:
             st.markdown(f'<div class="bot-message-container"><div class="bot-message">{ai_response}</div></div>', unsafe_allow_html=True)
         
-        # Store memory
-        memory_entry = f"User: {user_input.lower()} | Bot: {ai_response}"
-        agent.invoke(
-            {"messages": [{"role": "system", "content": f"Use manage_memory_tool to store: {memory_entry}"}]},
-            config=config
-        )
+        # Store memory as a structured record (skipped on read replicas)
+        store_turn(user_input, ai_response, config["configurable"]["thread_id"])
+
+# Memory inspector: browse the stored memories one cursor page at a time
+def reset_inspector():
+    st.session_state.inspector_cursors = [None]  # Cursor of every page visited; the last one is shown
+
+def memory_inspector():
+    if "inspector_cursors" not in st.session_state:
+        reset_inspector()
+    with st.sidebar:
+        st.header("Memory Inspector")
+        order = st.radio("Order", ["desc", "asc"], horizontal=True, on_change=reset_inspector,
+                         format_func=lambda o: "Newest first" if o == "desc" else "Oldest first")
+        page_size = st.select_slider("Page size", [10, LIST_PAGE_SIZE, 50, 100], value=LIST_PAGE_SIZE,
+                                     on_change=reset_inspector)
+        cursors = st.session_state.inspector_cursors
+        items, next_cursor = memory_store.list_memories(NAMESPACE, cursor=cursors[-1], page_size=page_size, order=order)
+        st.caption(f"Page {len(cursors)} · {memory_store.chrono.count(NAMESPACE)} memories in {'/'.join(NAMESPACE)}")
+
+        for item in items:
+            value = item.value
+            st.markdown(f"**#{value.get('seq')}** · {value.get('date', '')} · {value.get('role', '')} · {value.get('thread_id', '')}")
+            st.text(memory_content(item))
+        if not items:
+            st.write("No memories stored yet.")
+
+        prev_col, next_col = st.columns(2)
+        prev_col.button("◀ Previous", disabled=len(cursors) == 1, on_click=cursors.pop)
+        next_col.button("Next ▶", disabled=next_cursor is None, on_click=cursors.append, args=(next_cursor,))
 
 # Run the chat function
 chat_with_membot()
+memory_inspector()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# MemBot modules are imported flat (e.g. `from azure_openai_llm import get_llm`), as when run from langmem/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,87 @@
+"""
+Tests for the shared Azure OpenAI client layer against the local mock server (mock_azure_server.py).
+- 429 responses are retried until the mock answers.
+- Identical concurrent requests are coalesced into one upstream call.
+- Foreground requests are admitted before background ones when the rate limit is exhausted.
+"""
+
+import asyncio
+import itertools
+import json
+import threading
+import time
+import types
+
+import httpx
+import pytest
+
+import azure_openai_llm
+import mock_azure_server
+from azure_openai_llm import AsyncRateLimitedTransport, RateLimitedTransport, RateLimiter
+
+CHAT_PATH = "/openai/deployments/mock/chat/completions?api-version=2024-06-01"
+
+@pytest.fixture
+def mock_server(monkeypatch):
+    """Mock Azure server on a free port; yields its base URL with a fresh request counter."""
+    monkeypatch.setattr(mock_azure_server.MockAzureHandler, "requests_seen", 0)
+    monkeypatch.setattr(mock_azure_server.MockAzureHandler, "log_message", lambda *args: None)
+    server = mock_azure_server.serve(port=0)
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+def chat_body(text: str) -> bytes:
+    return json.dumps({"messages": [{"role": "user", "content": text}], "max_tokens": 10}).encode()
+
+def test_429_responses_are_retried(mock_server, monkeypatch):
+    # Every other upstream request is answered with 429 (retry-after-ms: 200)
+    monkeypatch.setattr(mock_azure_server.MockAzureHandler, "rate_429", 0.5)
+    draws = itertools.cycle([0.0, 1.0])
+    monkeypatch.setattr(mock_azure_server, "random", types.SimpleNamespace(random=lambda: next(draws)))
+
+    client = httpx.Client(base_url=mock_server, transport=RateLimitedTransport(httpx.HTTPTransport(), RateLimiter()))
+    responses = [client.post(CHAT_PATH, content=chat_body(f"question {i}")) for i in range(3)]
+
+    assert [r.status_code for r in responses] == [200, 200, 200]
+    assert mock_azure_server.MockAzureHandler.requests_seen == 6
+
+def test_identical_concurrent_requests_are_coalesced(mock_server, monkeypatch):
+    monkeypatch.setattr(mock_azure_server.MockAzureHandler, "latency", 0.3)
+
+    async def send_all():
+        transport = AsyncRateLimitedTransport(httpx.AsyncHTTPTransport(), RateLimiter())
+        async with httpx.AsyncClient(base_url=mock_server, transport=transport) as client:
+            return await asyncio.gather(*(client.post(CHAT_PATH, content=chat_body("same question")) for _ in range(5)))
+
+    responses = asyncio.run(send_all())
+
+    assert [r.status_code for r in responses] == [200] * 5
+    assert len({r.json()["id"] for r in responses}) == 1
+    assert mock_azure_server.MockAzureHandler.requests_seen == 1
+
+def test_foreground_is_admitted_before_background(mock_server):
+    limiter = RateLimiter(rpm=600)
+    limiter.backoff(0.5)  # Nothing is admitted for ~0.5 s, so both requests queue up
+    clients = {
+        priority: httpx.Client(base_url=mock_server, transport=RateLimitedTransport(httpx.HTTPTransport(), limiter, priority))
+        for priority in azure_openai_llm.PRIORITIES
+    }
+    completed = []
+
+    def send(priority: str) -> None:
+        clients[priority].post(CHAT_PATH, content=chat_body(f"{priority} request"))
+        completed.append(priority)
+
+    background = threading.Thread(target=send, args=("background",))
+    background.start()
+    deadline = time.monotonic() + 5
+    while not limiter._waiting and time.monotonic() < deadline:  # Background is queued first
+        time.sleep(0.01)
+    assert limiter._waiting, "background request never queued on the limiter"
+    foreground = threading.Thread(target=send, args=("foreground",))
+    foreground.start()
+    background.join()
+    foreground.join()
+
+    assert completed == ["foreground", "background"]
@@ -0,0 +1,61 @@
+import pytest
+
+from indexed_store import IndexedInMemoryStore
+from memory_quota import Quota, QuotaExceededError, QuotaManager
+
+def fake_embed(texts):
+    return [[float(len(text)), 1.0] for text in texts]
+
+def test_rejected_update_keeps_previous_memory():
+    store = IndexedInMemoryStore(
+        index={"dims": 2, "embed": fake_embed, "fields": ["content"]},
+        quota=QuotaManager(Quota(max_bytes=150), eviction="reject"),
+    )
+    store.put(("u",), "k", {"content": "small"})
+
+    with pytest.raises(QuotaExceededError):
+        store.put(("u",), "k", {"content": "x" * 500})
+
+    assert store.get(("u",), "k").value["content"] == "small"
+    assert store._vectors[("u",)]["k"] == {"content": [5.0, 1.0]}
+    assert [item.key for item in store.search(("u",), query="small")] == ["k"]
+    assert store.quota.usage(("u",))["entries"] == 1
+
+def test_rejected_new_memory_is_not_stored():
+    store = IndexedInMemoryStore(quota=QuotaManager(Quota(max_bytes=150), eviction="reject"))
+
+    with pytest.raises(QuotaExceededError):
+        store.put(("u",), "k", {"content": "x" * 500})
+
+    assert store.get(("u",), "k") is None
+    assert store.chrono.count(("u",)) == 0
+
+def test_only_used_search_results_count_as_accesses():
+    store = IndexedInMemoryStore(index={"dims": 2, "embed": fake_embed, "fields": ["content"]})
+    store.put(("u",), "k", {"content": "hello"})
+
+    prefetched = store.search(("u",), query="hello", count_access=False)
+    assert store._access[("u",)]["k"] == 0
+
+    store.record_access(prefetched)
+    store.search(("u",), query="hello")
+    assert store._access[("u",)]["k"] == 2
+
+@pytest.mark.parametrize("kwargs", [{"page_size": 0}, {"page_size": -1}, {"cursor": "abc"}])
+def test_list_memories_rejects_invalid_arguments(kwargs):
+    store = IndexedInMemoryStore()
+    store.put(("u",), "k", {"content": "hello"})
+
+    with pytest.raises(ValueError):
+        store.list_memories(("u",), **kwargs)
+
+def test_list_memories_pages_with_cursor():
+    store = IndexedInMemoryStore()
+    for i in range(5):
+        store.put(("u",), f"k{i}", {"content": f"memory {i}"})
+
+    items, cursor = store.list_memories(("u",), page_size=2)
+    rest, end = store.list_memories(("u",), cursor=cursor, page_size=10)
+
+    assert [item.key for item in items + rest] == [f"k{i}" for i in range(5)]
+    assert end is None
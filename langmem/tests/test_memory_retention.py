@@ -0,0 +1,88 @@
+"""
+Tests for retention policies in memory_retention.py on a scratch SQLite database.
+"""
+
+import sqlite3
+import time
+
+import pytest
+
+from memory_retention import RetentionPolicy, RetentionSweeper, connect, ensure_retention_schema, insert_memory
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "membot_memories.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE memories (id TEXT PRIMARY KEY, namespace TEXT, value TEXT UNIQUE)")
+    conn.execute("CREATE TABLE history (id INTEGER PRIMARY KEY AUTOINCREMENT, messages TEXT)")
+    conn.commit()
+    conn.close()
+    ensure_retention_schema(path)
+    return path
+
+def remaining(db_path: str, namespace: str) -> int:
+    conn = connect(db_path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM memories WHERE namespace = ?", (namespace,)).fetchone()[0]
+    finally:
+        conn.close()
+
+def test_namespace_ttl_expires_rows(db_path):
+    sweeper = RetentionSweeper(db_path, policies={"user_2": RetentionPolicy(ttl_seconds=60)})
+    conn = connect(db_path)
+    for i in range(3):
+        # Written without a policy, as a caller unaware of the namespace's TTL would
+        insert_memory(conn, f"u1-{i}", "user_1", f"user_1 memory {i}")
+        insert_memory(conn, f"u2-{i}", "user_2", f"user_2 memory {i}")
+    conn.execute("UPDATE memories SET created_at = ?", (time.time() - 120,))
+    conn.commit()
+    conn.close()
+
+    stats = sweeper.sweep_once()
+
+    assert stats["deleted"] == 3
+    assert remaining(db_path, "user_2") == 0
+    assert remaining(db_path, "user_1") == 3
+
+def test_ttl_from_insert_policy_keeps_fresh_rows(db_path):
+    policy = RetentionPolicy(ttl_seconds=60)
+    sweeper = RetentionSweeper(db_path, policies={"user_2": policy})
+    conn = connect(db_path)
+    insert_memory(conn, "fresh", "user_2", "fresh memory", sweeper.policy_for("user_2"))
+    conn.commit()
+    conn.close()
+
+    assert sweeper.sweep_once()["deleted"] == 0
+    assert remaining(db_path, "user_2") == 1
+
+def test_max_count_keeps_newest_by_created_at(db_path):
+    sweeper = RetentionSweeper(db_path, default_policy=RetentionPolicy(max_count=2))
+    conn = connect(db_path)
+    for i in range(5):
+        insert_memory(conn, f"k{i}", "user_1", f"memory {i}")
+    conn.execute("UPDATE memories SET created_at = created_at + 1000 WHERE id = 'k0'")
+    conn.commit()
+    conn.close()
+
+    sweeper.sweep_once()
+
+    conn = connect(db_path)
+    kept = {row[0] for row in conn.execute("SELECT id FROM memories")}
+    conn.close()
+    assert kept == {"k0", "k4"}
+
+def test_sweep_without_history_table(tmp_path):
+    # Layout written by batch_ingest.py: memories and vectors, no history
+    path = str(tmp_path / "ingested.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE memories (id TEXT PRIMARY KEY, namespace TEXT, value TEXT UNIQUE)")
+    conn.execute("CREATE TABLE memory_vectors (id TEXT PRIMARY KEY, vector BLOB)")
+    conn.executemany("INSERT INTO memories VALUES (?, ?, ?)", [(f"k{i}", "user_1", f"memory {i}") for i in range(5)])
+    conn.commit()
+    conn.close()
+    ensure_retention_schema(path)
+
+    stats = RetentionSweeper(path, default_policy=RetentionPolicy(max_count=2)).sweep_once()
+
+    assert stats["deleted"] == 3
+    assert stats["history_deleted"] == 0